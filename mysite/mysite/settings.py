@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,24 +43,64 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles'
 ]
 
+# Cache. Su VIESBUCIAI_CACHE_URL (redis://... arba memcached://host:port) - bendras
+# visiems procesams: sesijos (cached_db), prisijungę vartotojai (CachedAuthenticationMiddleware),
+# katalogo ir kalendorių versijos. Be jo - kiekvieno proceso LocMem (tik vienam procesui,
+# dev): DB sesijos, įprastas AuthenticationMiddleware, versijos galioja trumpai (caching.py).
+CACHE_URL = os.environ.get('VIESBUCIAI_CACHE_URL')
+if CACHE_URL and CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL[len('memcached://'):],
+        }
+    }
+elif CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'viesbuciai.middleware.CompressedStaticMiddleware',
+    'viesbuciai.middleware.ServerTimingMiddleware',
+    'viesbuciai.middleware.NPlusOneMiddleware',
+    'viesbuciai.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'viesbuciai.middleware.CachedAuthenticationMiddleware' if CACHE_URL else
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'viesbuciai.middleware.ProfileContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'mysite.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'viesbuciai.timing.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, "templates")],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Produkcijoje sukompiliuoti šablonai laikomi atmintyje. DEBUG režime
+            # šablonai skaitomi kiekvieną kartą, kad pakeitimai matytųsi be perkrovimo.
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -76,13 +117,72 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Duomenų bazės profilis (VIESBUCIAI_DB_PROFILE):
+#  dev - numatyta SQLite be papildomų nustatymų;
+#  sqlite - produkcinė SQLite: WAL, pragmos (viesbuciai/db.py), busy timeout ir nuolatinės jungtys;
+#  postgres - PostgreSQL su nuolatinėmis jungtimis ir jų patikra (VIESBUCIAI_DB_* kintamieji).
+#  Su PgBouncer (transaction pooling) nustatyti VIESBUCIAI_PGBOUNCER=1.
+DATABASE_PROFILE = os.environ.get('VIESBUCIAI_DB_PROFILE', 'dev')
+
+DATABASE_PROFILES = {
+    'dev': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {},
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'PRAGMAS': {},
+    },
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('VIESBUCIAI_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        # sqlite3 modulio laukimas užrakinus db (sekundės).
+        'OPTIONS': {'timeout': 20},
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 20000,
+            'cache_size': -64000,
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY',
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('VIESBUCIAI_DB_NAME', 'viesbuciai'),
+        'USER': os.environ.get('VIESBUCIAI_DB_USER', 'viesbuciai'),
+        'PASSWORD': os.environ.get('VIESBUCIAI_DB_PASSWORD', ''),
+        'HOST': os.environ.get('VIESBUCIAI_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('VIESBUCIAI_DB_PORT', '5432'),
+        'OPTIONS': {'connect_timeout': 5},
+        'CONN_MAX_AGE': int(os.environ.get('VIESBUCIAI_DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('VIESBUCIAI_PGBOUNCER') == '1',
+        'PRAGMAS': {},
+    },
+}
+
+DATABASES = {
+    'default': dict(DATABASE_PROFILES[DATABASE_PROFILE]),
 }
 
+# Skaitymo replikos (VIESBUCIAI_DB_REPLICAS, atskirtos kableliais): SQLite profiliuose -
+# failų keliai, kituose - replikų serveriai (HOST). Aliasai replica1, replica2, ...
+# Lokaliai: python manage.py sync_replicas nukopijuoja pagrindinę db į SQLite replikas.
+DATABASE_REPLICAS = []
+for replica in filter(None, (r.strip() for r in os.environ.get('VIESBUCIAI_DB_REPLICAS', '').split(','))):
+    alias = f"replica{len(DATABASE_REPLICAS) + 1}"
+    key = 'NAME' if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' else 'HOST'
+    DATABASES[alias] = {**DATABASES['default'], key: replica, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['viesbuciai.routers.ReplicaRouter']
+
+# Kiek sekundžių po rašymo kliento skaitymai eina į pagrindinę db (read-your-writes).
+REPLICA_STICKY_SECONDS = int(os.environ.get('VIESBUCIAI_REPLICA_STICKY_SECONDS', '10'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -119,6 +219,11 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic: failų vardai su turinio hash, staticfiles.json ir .gz/.br kopijos
+# (.br - jeigu įdiegtas brotli paketas). Atiduoda CompressedStaticMiddleware.
+STATICFILES_STORAGE = 'viesbuciai.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -127,6 +232,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = "/"
 
+# Sesijos skaitomos iš bendro cache, įrašomos ir į DB (write-through). Be bendro cache - DB.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db' if CACHE_URL else 'django.contrib.sessions.backends.db'
+
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = 'mail.inbox.lt'
@@ -137,3 +245,40 @@ EMAIL_HOST_PASSWORD = 'superhardpassword'
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+# Async skaitymo view'sai (hotels, hotel_filter, my_orders). Įjungiama ASGI serveryje (asgi.py).
+ASYNC_VIEWS = os.environ.get('VIESBUCIAI_ASYNC_VIEWS') == '1'
+
+# Viešbučių kiekis viename sąrašo puslapyje
+HOTELS_PER_PAGE = 2
+
+# Užsakymų kiekis admin užsakymų sąrašo puslapyje
+ORDERS_PER_PAGE = 50
+
+# Vartotojų kiekis admin vartotojų sąrašo puslapyje
+USERS_PER_PAGE = 50
+
+# Viešbučių kiekis viename JSON API puslapyje
+API_PAGE_SIZE = 100
+
+
+# Server-Timing antraštė: matuojamų užklausų dalis (0..1) ir JSON log eilutė kiekvienai matuotai užklausai
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('VIESBUCIAI_TIMING_SAMPLE_RATE', '1.0'))
+SERVER_TIMING_LOG = os.environ.get('VIESBUCIAI_TIMING_LOG') == '1'
+
+# N+1 detektorius: kiek kartų ta pati SELECT forma gali kartotis vienoje užklausoje.
+# Testuose (manage.py test) viršijimas kelia klaidą, kitur - rašoma į logą.
+NPLUSONE_ENABLED = os.environ.get('VIESBUCIAI_NPLUSONE', '1') == '1'
+NPLUSONE_THRESHOLD = 5
+NPLUSONE_RAISE = sys.argv[1:2] == ['test'] or os.environ.get('VIESBUCIAI_NPLUSONE_RAISE') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'viesbuciai.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'viesbuciai.nplusone': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
@@ -1,8 +1,78 @@
+from django import forms
 from django.contrib import admin
-from .models import Balance, Hotel, Order, AdminDetails, Profile
+from django.db.models import F
+from .models import Balance, BalanceLedger, Hotel, Order, AdminDetails, Profile, HotelNight, DailyHotelStats
+from .reports import is_stay
+from .services import save_order
+
+
+# __str__ naudoja susijusius objektus, todėl sąrašuose jie įkeliami tuo pačiu JOIN'u.
+@admin.register(Balance)
+class BalanceAdmin(admin.ModelAdmin):
+    list_select_related = ('user',)
+
+
+# Žurnalas tik papildomas per BalanceLedger.objects.record(), admin'e tik peržiūra.
+@admin.register(BalanceLedger)
+class BalanceLedgerAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'kind', 'amount', 'order_id', 'created')
+    list_filter = ('kind',)
+    list_select_related = ('user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class OrderAdminForm(forms.ModelForm):
+    """
+    Patikrina, ar naujoms užsakymo naktims liko vietų (naktys, kurias
+    užsakymas jau laiko, neskaičiuojamos), kad klaida būtų rodoma formoje.
+    """
+
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        hotel, r_date, i_date = cleaned_data.get('hotel'), cleaned_data.get('r_date'), cleaned_data.get('i_date')
+        if hotel is None or r_date is None or i_date is None or r_date >= i_date:
+            return cleaned_data
+
+        held = []
+        old = self.instance._stay if self.instance.pk else None
+        if old is not None and self.instance.reserved and is_stay(old) and old[0] == hotel.pk:
+            held = HotelNight.objects.nights(old[1], old[2])
+        full = HotelNight.objects.for_range(hotel, r_date, i_date).filter(sold__gte=F('capacity')).exclude(date__in=held)
+        if hotel.availability < 1 or full.exists():
+            raise forms.ValidationError("Pasirinktam laikotarpiui nėra laisvų kambarių.")
+        return cleaned_data
+
+
+# Užsakymai išsaugomi per services.save_order, kad naktys būtų rezervuojamos
+# kaip ir vartotojų užsakymuose (ištrynus - atlaisvina release_order_nights).
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
+    list_select_related = ('client', 'hotel')
+    readonly_fields = ('reserved', 'price_cents')
+
+    def save_model(self, request, obj, form, change):
+        save_order(obj)
+
+
+@admin.register(AdminDetails)
+class AdminDetailsAdmin(admin.ModelAdmin):
+    list_select_related = ('client',)
+
 
-admin.site.register(Balance)
 admin.site.register(Hotel)
-admin.site.register(Order)
-admin.site.register(AdminDetails)
 admin.site.register(Profile)
+admin.site.register(HotelNight)
+admin.site.register(DailyHotelStats)
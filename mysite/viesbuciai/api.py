@@ -0,0 +1,134 @@
+import hashlib
+from datetime import date
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+from .catalog import cached, catalog_last_modified, catalog_version
+from .models import Hotel
+from .occupancy import CALENDAR_MAX_MONTHS, CALENDAR_MIN_MONTHS, calendar_version, hotel_calendar
+from .pagination import KeysetPage, decode_cursor, keyset_page
+from .routers import replica_reads
+from .search import filter_hotels
+
+API_VERSION = 'v1'
+API_PAGE_SIZE = getattr(settings, 'API_PAGE_SIZE', 100)
+HOTEL_API_FIELDS = ('id', 'name', 'type', 'stars', 'description', 'address', 'price', 'quantity', 'availability')
+FILTER_PARAMS = ('name', 'q', 'stars', 'quantity')
+
+
+def requested_fields(request):
+    """
+    ?fields=id,name,price - tik nurodyti laukai (nežinomi ignoruojami).
+    """
+    fields = [f for f in request.GET.get('fields', '').split(',') if f in HOTEL_API_FIELDS]
+    return tuple(fields) or HOTEL_API_FIELDS
+
+
+def serialize(hotel, fields):
+    return {field: getattr(hotel, field) for field in fields}
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Stiprus ETag: katalogo versija + užklausos kelias ir parametrai.
+    Apskaičiuojamas be užklausų į DB, todėl 304 atsakymui kūnas nekuriamas.
+    """
+    key = f"{API_VERSION}:{catalog_version()}:{request.get_full_path()}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def catalog_modified(request, *args, **kwargs):
+    return catalog_last_modified()
+
+
+def api_response(payload):
+    return JsonResponse(payload, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+@condition(etag_func=catalog_etag, last_modified_func=catalog_modified)
+@replica_reads
+def hotel_list(request):
+    """
+    Viešbučių sąrašas (JSON), puslapiais pagal kursorių (?after=, ?before=).
+    """
+    fields = requested_fields(request)
+    after, before = request.GET.get('after'), request.GET.get('before')
+
+    def build():
+        page = keyset_page(Hotel.objects.all(), API_PAGE_SIZE, after=after, before=before)
+        return {
+            'results': [serialize(hotel, fields) for hotel in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        }
+
+    name = f"api:list:{','.join(fields)}:{decode_cursor(after)}:{decode_cursor(before)}"
+    return api_response(cached(name, build))
+
+
+@require_GET
+@condition(etag_func=catalog_etag, last_modified_func=catalog_modified)
+@replica_reads
+def hotel_detail(request, pk):
+    fields = requested_fields(request)
+    hotel = Hotel.objects.filter(pk=pk).first()
+    if hotel is None:
+        return JsonResponse({'detail': 'Viešbutis nerastas.'}, status=404)
+    return api_response(serialize(hotel, fields))
+
+
+@require_GET
+@condition(etag_func=catalog_etag, last_modified_func=catalog_modified)
+@replica_reads
+def hotel_filter(request):
+    """
+    Tie patys parametrai kaip hotel_filter puslapyje: name, q, stars, quantity.
+    Puslapiais po API_PAGE_SIZE pagal kursorių (?after=, ?before=). Pilno teksto
+    paieška (?q=) grąžina vieną puslapį geriausiai atitinkančių.
+    """
+    fields = requested_fields(request)
+    params = {param: request.GET.get(param) for param in FILTER_PARAMS}
+    hotels_ = filter_hotels(**params)
+    if params['q']:
+        # search_hotels jau surikiuoti pagal atitikimą (bm25) ir apriboti.
+        page = KeysetPage(hotels_[:API_PAGE_SIZE])
+    else:
+        page = keyset_page(hotels_, API_PAGE_SIZE, after=request.GET.get('after'), before=request.GET.get('before'))
+    return api_response({
+        'results': [serialize(hotel, fields) for hotel in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def calendar_etag(request, pk):
+    # Be ?start= kalendorius prasideda šiandien - diena įeina į raktą, kad rytoj nebūtų 304.
+    start = request.GET.get('start') or date.today().isoformat()
+    key = f"{API_VERSION}:calendar:{calendar_version(pk)}:{start}:{request.get_full_path()}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+@require_GET
+@condition(etag_func=calendar_etag)
+@replica_reads
+def hotel_calendar_view(request, pk):
+    """
+    Viešbučio užimtumas kiekvienai nakčiai: ?start=YYYY-MM-DD (numatyta - šiandien),
+    ?months=3..12 (numatyta - 3).
+    """
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else date.today()
+        months = int(request.GET.get('months', CALENDAR_MIN_MONTHS))
+    except ValueError:
+        return JsonResponse({'detail': 'Neteisingi parametrai.'}, status=400)
+    if not CALENDAR_MIN_MONTHS <= months <= CALENDAR_MAX_MONTHS:
+        return JsonResponse(
+            {'detail': f'months turi būti nuo {CALENDAR_MIN_MONTHS} iki {CALENDAR_MAX_MONTHS}.'}, status=400
+        )
+
+    payload = hotel_calendar(pk, start, months)
+    if payload is None:
+        return JsonResponse({'detail': 'Viešbutis nerastas.'}, status=404)
+    return api_response(payload)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ViesbuciaiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'viesbuciai'
+
+    def ready(self):
+        # Signalai aprašyti views.py - užregistruojami ir be urls importo
+        # (management komandos, shell).
+        from . import views  # noqa: F401
+        # SQLite pragmos naujoms jungtims (DATABASES[...]['PRAGMAS']).
+        from . import db  # noqa: F401
+        # Bendro cache patikra (sesijos ir vartotojai cache).
+        from . import checks  # noqa: F401
@@ -0,0 +1,115 @@
+from datetime import date
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, HttpResponseRedirect
+from .catalog import abookable_options, acatalog_page, affordable
+from .middleware import aload_profile_context
+from .models import Hotel, HotelNight, Order
+from .routers import replica_reads
+from .search import filter_hotels, search_hotels
+
+# Async (ASGI) skaitymo view'sai: hotels, hotel_filter, my_orders ir
+# prieinamumo paieška. Laukiant DB neužimamas gijų telkinio slotas.
+
+LOGIN_URL = "/viesbuciai/accounts/login/"
+
+
+def _authenticated_user(request):
+    # request.user įkeliamas sinchroniškai (sesija + vartotojas).
+    return request.user if request.user.is_authenticated else None
+
+
+async def current_user(request):
+    return await sync_to_async(_authenticated_user)(request)
+
+
+@replica_reads
+async def hotels(request):
+    """
+    Viešbučių view'sas (async).
+    :param request: automatinė užklausa.
+    :return: rodoma viešbučių ir balanco informacija.
+    Neužpildžius profilio, grįžtama atgal.
+    """
+    user = await current_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path(), LOGIN_URL)
+
+    profile_context = await aload_profile_context(user)
+    if not profile_context.complete:
+        return HttpResponseRedirect('/viesbuciai/accounts/profile/')
+
+    context = {
+        "hotels": affordable(await abookable_options(), profile_context.balance),
+        "hotels_": await acatalog_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page=request.GET.get('page'),
+        ),
+        "balance": profile_context.balance
+    }
+    return render(request, 'hotels.html', context=context)
+
+
+@replica_reads
+async def hotel_filter(request):
+    """
+    Viešbučių filtravimo paieška (async), parametrai kaip views.hotel_filter.
+    """
+    user = await current_user(request)
+    if user is None:
+        return redirect_to_login(request.get_full_path(), LOGIN_URL)
+
+    profile_context = await aload_profile_context(user)
+    if not profile_context.complete:
+        return HttpResponseRedirect('/viesbuciai/accounts/profile/')
+
+    params = {param: request.GET.get(param) for param in ('name', 'q', 'stars', 'quantity')}
+    if params['q']:
+        # FTS5 užklausa - RawQuerySet neturi async iteracijos.
+        hotels_ = await sync_to_async(search_hotels)(params['q'], stars=params['stars'], quantity=params['quantity'])
+    else:
+        hotels_ = [hotel async for hotel in filter_hotels(**params)]
+
+    context = {'hotels': hotels_, 'balance': profile_context.balance}
+    return render(request, 'hotel_filter.html', context)
+
+
+@replica_reads
+async def my_orders(request):
+    """
+    Mano užsakymų view'sas (async).
+    """
+    user = await current_user(request)
+    if user is None:
+        return redirect('login')
+
+    orders_ = [
+        order async for order in
+        Order.objects.filter(client__user=user).select_related('hotel', 'admin_details')
+    ]
+    return render(request, 'my_orders.html', {'orders': orders_})
+
+
+@replica_reads
+async def hotel_availability(request, pk):
+    """
+    Ar viešbutyje yra laisvų kambarių visoms naktims (?r_date=&i_date=, YYYY-MM-DD).
+    """
+    try:
+        r_date = date.fromisoformat(request.GET.get('r_date', ''))
+        i_date = date.fromisoformat(request.GET.get('i_date', ''))
+    except ValueError:
+        return JsonResponse({'detail': 'Neteisingos datos.'}, status=400)
+    if i_date <= r_date:
+        return JsonResponse({'detail': 'Neteisingos datos.'}, status=400)
+
+    hotel = await Hotel.objects.filter(pk=pk).afirst()
+    if hotel is None:
+        return JsonResponse({'detail': 'Viešbutis nerastas.'}, status=404)
+
+    available = await HotelNight.objects.ais_available(hotel, r_date, i_date)
+    return JsonResponse({
+        'hotel': hotel.pk, 'r_date': r_date, 'i_date': i_date, 'available': available
+    })
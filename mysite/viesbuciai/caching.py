@@ -0,0 +1,24 @@
+from django.conf import settings
+
+# Kiekvieno proceso atskiras cache: kitų procesų pakeitimai jame nematomi.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+# Katalogo ir kalendorių versijų galiojimas (s), kai cache nėra bendras: kiti
+# procesai pakeitimą pamato ne vėliau nei po tiek laiko.
+LOCAL_VERSION_TIMEOUT = 30
+
+
+def cache_is_shared(alias='default'):
+    """
+    Ar CACHES[alias] bendras visiems procesams (Redis, Memcached, failai, DB).
+    """
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def version_timeout():
+    """
+    Versijų raktų galiojimas: bendrame cache - neribotas, LocMem - trumpas.
+    """
+    return None if cache_is_shared() else LOCAL_VERSION_TIMEOUT
@@ -0,0 +1,161 @@
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.cache import cache
+from operator import itemgetter
+from .caching import version_timeout
+from .models import Hotel
+from .pagination import akeyset_page, decode_cursor, keyset_page
+from .routers import use_primary
+
+CATALOG_VERSION_KEY = "viesbuciai:catalog:version"
+CATALOG_CHANGED_KEY = "viesbuciai:catalog:changed"
+CATALOG_TIMEOUT = 60 * 60 * 24
+HOTELS_PER_PAGE = getattr(settings, 'HOTELS_PER_PAGE', 2)
+
+
+def catalog_version():
+    """
+    Dabartinė katalogo versija. Didinama kiekvieną kartą išsaugojus ar
+    ištrynus viešbutį, todėl seni cache įrašai tiesiog nebenaudojami.
+    Bendrame cache versija laikoma neribotai, LocMem (atskiras kiekvienam
+    procesui) - tik trumpai, kad kitų procesų pakeitimai būtų pamatyti
+    (caching.version_timeout).
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Versija dingo iš cache - pradedama nuo laiko žymos, kad nesutaptų su senomis.
+        if cache.add(CATALOG_VERSION_KEY, time.time_ns(), version_timeout()):
+            cache.set(CATALOG_CHANGED_KEY, time.time(), version_timeout())
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def catalog_last_modified():
+    """
+    Paskutinio katalogo pakeitimo laikas (Last-Modified antraštei).
+    """
+    catalog_version()
+    changed = cache.get(CATALOG_CHANGED_KEY)
+    if changed is None:
+        changed = time.time()
+        cache.set(CATALOG_CHANGED_KEY, changed, version_timeout())
+    return datetime.fromtimestamp(int(changed), tz=timezone.utc)
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), version_timeout())
+    cache.set(CATALOG_CHANGED_KEY, time.time(), version_timeout())
+
+
+def catalog_key(name, version=None):
+    return f"viesbuciai:catalog:{version or catalog_version()}:{name}"
+
+
+def cached(name, build):
+    """
+    Grąžina `name` įrašą iš dabartinės katalogo versijos cache arba jį sukuria.
+    Kuriama iš pagrindinės db, kad naujai versijai neliktų replikos atsilikimo.
+    """
+    key = catalog_key(name)
+    value = cache.get(key)
+    if value is None:
+        with use_primary():
+            value = build()
+        cache.set(key, value, CATALOG_TIMEOUT)
+    return value
+
+
+def bookable_hotels():
+    """
+    Viešbučiai, kuriuos galima pasirinkti užsakymui (yra kambarių ir nurodyta kaina).
+    """
+    return cached("bookable", lambda: list(Hotel.objects.filter(availability__gt=0, price__isnull=False)))
+
+
+def bookable_options_query():
+    return Hotel.objects.filter(availability__gt=0, price__isnull=False).order_by('price', 'id').values('id', 'name', 'price')
+
+
+def bookable_options():
+    """
+    Užsakymo formos pasirinkimai (id, name, price), surikiuoti pagal kainą.
+    Viena kopija katalogo versijai - balanso filtras taikomas affordable().
+    """
+    return cached("bookable_options", lambda: list(bookable_options_query()))
+
+
+def affordable(options, balance):
+    """
+    Pasirinkimai, kurių kaina neviršija balanso (dvejetainė paieška pagal kainą).
+    """
+    return options[:bisect_right(options, balance, key=itemgetter('price'))]
+
+
+def page_name(after, before, page, per_page):
+    page = page if str(page).isdigit() else None
+    return f"page:{per_page}:{decode_cursor(after)}:{decode_cursor(before)}:{page}"
+
+
+def catalog_page(after=None, before=None, page=None, per_page=HOTELS_PER_PAGE):
+    """
+    Viešbučių sąrašo puslapis (KeysetPage) pagal Hotel.Meta.ordering (id).
+    Cache raktas - kursorius, todėl kiekvienas puslapis kuriamas vieną kartą
+    kiekvienai katalogo versijai.
+    """
+    name = page_name(after, before, page, per_page)
+    return cached(name, lambda: keyset_page(
+        Hotel.objects.all(), per_page, after=after, before=before, page=page, key=Hotel._meta.ordering[0]
+    ))
+
+
+def prewarm(pages=10, per_page=HOTELS_PER_PAGE):
+    """
+    Užpildo cache po diegimo: užsakymui tinkami viešbučiai ir pirmieji puslapiai.
+    :return: sukurtų puslapių kiekis.
+    """
+    bookable_hotels()
+    bookable_options()
+    page = catalog_page(per_page=per_page)
+    warmed = 1
+    while page.has_next() and warmed < pages:
+        page = catalog_page(after=page.next_cursor, per_page=per_page)
+        warmed += 1
+    return warmed
+
+
+# Async versijos (ASGI view'sams). Naudoja tuos pačius cache raktus.
+
+async def acatalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        if await cache.aadd(CATALOG_VERSION_KEY, time.time_ns(), version_timeout()):
+            await cache.aset(CATALOG_CHANGED_KEY, time.time(), version_timeout())
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+async def acached(name, abuild):
+    key = catalog_key(name, await acatalog_version())
+    value = await cache.aget(key)
+    if value is None:
+        with use_primary():
+            value = await abuild()
+        await cache.aset(key, value, CATALOG_TIMEOUT)
+    return value
+
+
+async def abookable_options():
+    async def build():
+        return [option async for option in bookable_options_query()]
+    return await acached("bookable_options", build)
+
+
+async def acatalog_page(after=None, before=None, page=None, per_page=HOTELS_PER_PAGE):
+    return await acached(page_name(after, before, page, per_page), lambda: akeyset_page(
+        Hotel.objects.all(), per_page, after=after, before=before, page=page, key=Hotel._meta.ordering[0]
+    ))
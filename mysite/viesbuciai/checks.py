@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from .caching import cache_is_shared
+
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+CACHED_AUTHENTICATION_MIDDLEWARE = 'viesbuciai.middleware.CachedAuthenticationMiddleware'
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Sesijos ir prisijungę vartotojai cache laikomi tik bendrame cache: LocMem
+    atveju atsijungimas, slaptažodžio keitimas ar deaktyvavimas išvalytų tik
+    vieno proceso cache, o kiti procesai dar naudotų seną vartotoją.
+    """
+    if cache_is_shared():
+        return []
+    hint = "Nustatykite VIESBUCIAI_CACHE_URL (Redis arba Memcached)."
+    errors = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        errors.append(Error(
+            f"SESSION_ENGINE {settings.SESSION_ENGINE} reikalauja bendro cache, o CACHES['default'] - "
+            f"{settings.CACHES['default']['BACKEND']}.", hint=hint, id='viesbuciai.E001',
+        ))
+    if CACHED_AUTHENTICATION_MIDDLEWARE in settings.MIDDLEWARE:
+        errors.append(Error(
+            f"{CACHED_AUTHENTICATION_MIDDLEWARE} reikalauja bendro cache, o CACHES['default'] - "
+            f"{settings.CACHES['default']['BACKEND']}.", hint=hint, id='viesbuciai.E002',
+        ))
+    return errors
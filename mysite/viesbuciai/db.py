@@ -0,0 +1,15 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Kiekvienai naujai SQLite jungčiai pritaiko DATABASES[...]['PRAGMAS']
+    (žr. 'sqlite' profilį settings.py). Vykdoma tiesiai sqlite3 jungtimi,
+    todėl nepatenka į užklausų skaitiklius.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in connection.settings_dict.get('PRAGMAS', {}).items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,128 @@
+import csv
+import json
+from decimal import Decimal
+from .models import DailyHotelStats, Hotel, Order
+
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_FIELDS = (
+    ('id', 'id'),
+    ('order_date', 'order_date'),
+    ('r_date', 'r_date'),
+    ('i_date', 'i_date'),
+    ('status', 'status'),
+    ('hotel_id', 'hotel_id'),
+    ('hotel', 'hotel__name'),
+    # Užsakymo metu užfiksuota nakties kaina (ne dabartinė hotel.price).
+    ('price', 'price_cents'),
+    ('client_id', 'client_id'),
+    ('username', 'client__user__username'),
+    ('name', 'client__name'),
+    ('lastname', 'client__lastname'),
+    ('city', 'client__city'),
+    ('country', 'client__country'),
+    ('room_id', 'admin_details__room_id'),
+    ('aukstas', 'admin_details__aukstas'),
+    ('ramybes_valandos', 'admin_details__ramybes_valandos'),
+)
+
+HOTEL_FIELDS = (
+    ('id', 'id'),
+    ('external_id', 'external_id'),
+    ('name', 'name'),
+    ('type', 'type'),
+    ('stars', 'stars'),
+    ('price', 'price'),
+    ('quantity', 'quantity'),
+    ('availability', 'availability'),
+    ('address', 'address'),
+    ('description', 'description'),
+)
+
+DAILY_FIELDS = (
+    ('date', 'date'),
+    ('hotel_id', 'hotel_id'),
+    ('hotel', 'hotel__name'),
+    ('capacity', 'capacity'),
+    ('rooms_sold', 'rooms_sold'),
+    ('revenue_cents', 'revenue_cents'),
+    ('occupancy', 'occupancy'),
+    ('adr_cents', 'adr_cents'),
+    ('revpar_cents', 'revpar_cents'),
+)
+
+
+def money(cents):
+    """
+    Centai -> suma eurais su dviem skaitmenimis po kablelio ("55.00").
+    """
+    return None if cents is None else str(Decimal(cents).scaleb(-2))
+
+
+# Stulpeliai, kurie eksportuojami ne tokie, kokie saugomi db.
+FORMATTERS = {
+    ('orders', 'price_cents'): money,
+}
+
+EXPORTS = {
+    'orders': ORDER_FIELDS,
+    'hotels': HOTEL_FIELDS,
+    'daily': DAILY_FIELDS,
+}
+
+
+def export_rows(kind, status=None, hotel=None, date_from=None, date_to=None):
+    """
+    Eksportuojamos eilutės (tuple) vienu JOIN'u. Naudojamas DB kursorius su
+    `iterator(chunk_size)`, todėl atmintyje laikoma tik viena dalis.
+    Filtrai taikomi užsakymams ir dienos suvestinei (ji skaitoma tik iš
+    DailyHotelStats, užsakymų lentelė neliečiama).
+    """
+    columns = [column for _, column in EXPORTS[kind]]
+    if kind == 'orders':
+        queryset = Order.objects.filtered(
+            status=status, hotel=hotel, date_from=date_from, date_to=date_to
+        ).order_by('id')
+    elif kind == 'daily':
+        queryset = DailyHotelStats.objects.period(
+            hotel=hotel, date_from=date_from, date_to=date_to
+        ).with_metrics().order_by('date', 'hotel_id')
+    else:
+        queryset = Hotel.objects.order_by('id')
+    rows = queryset.values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    formatters = [(i, FORMATTERS[kind, column]) for i, column in enumerate(columns) if (kind, column) in FORMATTERS]
+    if formatters:
+        rows = (formatted(row, formatters) for row in rows)
+    return rows
+
+
+def formatted(row, formatters):
+    row = list(row)
+    for i, formatter in formatters:
+        row[i] = formatter(row[i])
+    return tuple(row)
+
+
+class _Echo:
+    # csv.writer rašo į "failą", kuris tiesiog grąžina eilutę.
+    def write(self, value):
+        return value
+
+
+def stream_csv(kind, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORTS[kind]])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(kind, rows):
+    names = [name for name, _ in EXPORTS[kind]]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), default=str, ensure_ascii=False) + '\n'
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
@@ -54,13 +54,6 @@ class RegistrationForm(forms.ModelForm):
         return cd['password2']
 
 
-class HotelSelectForm(forms.Form):
-    """
-    Hotelio pasirinkimo forma naudojama iš hotels.html)
-    """
-    hotel = forms.ModelChoiceField(queryset=Hotel.objects.all())
-
-
 class OrderForm(forms.ModelForm):
     """
     Užsakymo forma (rezervacijos)
@@ -111,3 +104,81 @@ class HotelForm(forms.ModelForm):
     class Meta:
         model = Hotel
         fields = ['name', 'type', 'stars', 'price', 'address', 'description', 'quantity', 'availability']
+
+
+class HotelIdField(forms.ModelChoiceField):
+    """
+    Viešbutis nurodomas id laukelyje, o ne <select> su visais viešbučiais:
+    formos atvaizdavimas neskaito lentelės, validacija - viena užklausa pagal pk.
+    """
+    widget = forms.NumberInput(attrs={'min': 1, 'placeholder': 'ID'})
+    default_error_messages = {'invalid_choice': "Viešbučio su tokiu ID nėra."}
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('label', "Viešbučio ID")
+        super().__init__(queryset=Hotel.objects.only('id', 'name'), **kwargs)
+
+
+class OrderFilterForm(forms.Form):
+    """
+    Visų užsakymų sąrašo filtrai (statusas, viešbutis, įsiregistravimo datos).
+    Prieiga tik admin useriui.
+    """
+    status = forms.ChoiceField(choices=(('', '---------'),) + Order.STATUS, required=False, label="Statusas")
+    hotel = HotelIdField()
+    date_from = forms.DateField(widget=forms.TextInput(attrs={'type': 'date'}), required=False, label="Nuo")
+    date_to = forms.DateField(widget=forms.TextInput(attrs={'type': 'date'}), required=False, label="Iki")
+
+
+class DailyReportForm(forms.Form):
+    """
+    Dienos suvestinės ataskaitos filtrai (viešbutis, laikotarpis).
+    Prieiga tik admin useriui.
+    """
+    hotel = HotelIdField()
+    date_from = forms.DateField(widget=forms.TextInput(attrs={'type': 'date'}), required=False, label="Nuo")
+    date_to = forms.DateField(widget=forms.TextInput(attrs={'type': 'date'}), required=False, label="Iki")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("Pradžios data vėlesnė už pabaigos datą.")
+        return cleaned_data
+
+
+class GroupReservationLineForm(forms.Form):
+    """
+    Viena grupinės rezervacijos eilutė (viešbutis ir datos).
+    Viešbučių pasirinkimai paduodami iš katalogo cache, todėl formos
+    validacija nedaro užklausų.
+    """
+    hotel = forms.TypedChoiceField(coerce=int, label="Viešbutis")
+    r_date = forms.DateField(widget=forms.TextInput(attrs={'type': 'date'}), label="Įsiregistravimo data")
+    i_date = forms.DateField(widget=forms.TextInput(attrs={'type': 'date'}), label="Išsiregistravimo data")
+
+    def __init__(self, *args, hotels=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['hotel'].choices = [('', '---------')] + [(hotel.id, hotel.name) for hotel in hotels]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        r_date = cleaned_data.get('r_date')
+        i_date = cleaned_data.get('i_date')
+        if r_date and i_date:
+            if r_date < date.today():
+                raise forms.ValidationError("Įsiregistravimo data negali būti praėjusi.")
+            if i_date <= r_date:
+                raise forms.ValidationError("Išsiregistravimo data turi būti vėlesnė.")
+        return cleaned_data
+
+
+GROUP_RESERVATION_MAX_LINES = 50
+
+
+def group_reservation_formset(lines=10):
+    return forms.formset_factory(
+        GroupReservationLineForm, extra=min(lines, GROUP_RESERVATION_MAX_LINES),
+        max_num=GROUP_RESERVATION_MAX_LINES, validate_max=True
+    )
@@ -0,0 +1,93 @@
+import atexit
+import os
+import tempfile
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+
+DB_SUFFIXES = ('', '-wal', '-shm', '-journal')
+
+
+def remove_database_files(path):
+    connections.close_all()
+    for suffix in DB_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def protected_databases():
+    """
+    SQLite failai, kurių scratch komandos niekada neperrašo: sukonfigūruotos
+    jungtys ir visi settings.DATABASE_PROFILES failai (pagrindinė db.sqlite3).
+    """
+    configs = [*settings.DATABASES.values(), *settings.DATABASE_PROFILES.values()]
+    return {
+        os.path.realpath(config['NAME']) for config in configs
+        if config['ENGINE'] == 'django.db.backends.sqlite3' and config.get('NAME')
+    }
+
+
+def scratch_path(path=None, force=False, keep=False):
+    """
+    Patikrina (ar paruošia) atskiros SQLite db failą, dar nekeičiant jungčių.
+    :param path: failas; None - laikinas failas, ištrinamas procesui baigiantis
+    (jeigu ne `keep`). Esamas failas ištrinamas tik su `force`, pagrindinės
+    db failai - niekada (CommandError).
+    :return: failo kelias.
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='viesbuciai-', suffix='.sqlite3')
+        os.close(fd)
+        if not keep:
+            atexit.register(remove_database_files, path)
+        return path
+    path = str(path)
+    if os.path.realpath(path) in protected_databases():
+        raise CommandError(f"{path} - projekto duomenų bazė, jos naudoti negalima.")
+    if os.path.exists(path):
+        if not force:
+            raise CommandError(f"Failas {path} jau yra ir būtų ištrintas. Perrašyti - su --force.")
+        remove_database_files(path)
+    return path
+
+
+def use_scratch_database(path=None, alias='default', force=False, keep=False):
+    """
+    Perjungia `alias` jungtį į atskirą SQLite failą (scratch_path) ir pritaiko migracijas.
+    Naudojama stress/benchmark komandoms, kad nebūtų liečiama tikroji db.sqlite3.
+    :return: naudojamo failo kelias.
+    """
+    return migrate_database_file(scratch_path(path, force, keep), alias)
+
+
+def migrate_database_file(path, alias):
+    connections.close_all()
+    connection = connections[alias]
+    connection.settings_dict['NAME'] = path
+    call_command('migrate', database=alias, verbosity=0, interactive=False)
+    connections.close_all()
+    return path
+
+
+def use_database_profile(profile, path=None, alias='default', force=False):
+    """
+    Perjungia `alias` jungtį į settings.DATABASE_PROFILES[profile] nustatymus.
+    SQLite profiliams naudojamas atskiras failas (scratch_path), kitiems -
+    Django test_ duomenų bazė, sukuriama iš naujo.
+    :return: naudojamos duomenų bazės pavadinimas.
+    """
+    if profile not in settings.DATABASE_PROFILES:
+        raise CommandError(f"Nežinomas profilis: {profile} ({', '.join(settings.DATABASE_PROFILES)})")
+    sqlite = settings.DATABASE_PROFILES[profile]['ENGINE'] == 'django.db.backends.sqlite3'
+    # Failas tikrinamas prieš keičiant jungtį - atmetus ji lieka nepaliesta.
+    if sqlite:
+        path = scratch_path(path, force)
+    connections.close_all()
+    connection = connections[alias]
+    connection.settings_dict.update(settings.DATABASE_PROFILES[profile])
+    if sqlite:
+        return migrate_database_file(path, alias)
+    name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    connections.close_all()
+    return name
@@ -0,0 +1,98 @@
+import random
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from viesbuciai.catalog import bump_catalog_version
+from viesbuciai.models import Balance, BalanceLedger, Hotel, Order, Profile, to_cents
+from viesbuciai.services import create_orders_bulk
+
+NAMES = ('Jonas', 'Petras', 'Ona', 'Rasa', 'Tomas', 'Greta', 'Lukas', 'Ieva', 'Mantas', 'Austėja')
+LASTNAMES = ('Kazlauskas', 'Jankauskas', 'Petrauskas', 'Stankevičius', 'Vasiliauskas', 'Žukauskas')
+CITIES = ('Vilnius', 'Kaunas', 'Klaipėda', 'Šiauliai', 'Panevėžys', 'Palanga', 'Druskininkai')
+WORDS = ('Baltic', 'Amber', 'Old Town', 'Park', 'River', 'Grand', 'Royal', 'Forest', 'Lake', 'Central')
+
+SEED_PASSWORD = 'seed'
+
+
+def seed(users=100, hotels=50, orders=1000, seed=0, batch_size=1000, password=SEED_PASSWORD):
+    """
+    Sugeneruoja atkuriamus (pagal `seed`) duomenis: admin ir `users`
+    vartotojų su užpildytais profiliais ir balansais, `hotels` viešbučių ir
+    iki `orders` užsakymų. Užsakymai neviršija nakčių talpos, naktys
+    rezervuojamos kaip importe (create_orders_bulk). Viskas įrašoma bulk_create.
+    :return: žodynas su sukurtų objektų kiekiais ir vartotojų vardais.
+    """
+    rnd = random.Random(seed)
+    today = date.today()
+    hashed = make_password(password)
+
+    admin = User.objects.create_user('admin', password=password)
+    Profile.objects.filter(user=admin).update(
+        name='Admin', lastname='Admin', address='Gedimino pr. 1', city='Vilnius',
+        country='Lietuva', birth_date=date(1980, 1, 1)
+    )
+
+    created_users = User.objects.bulk_create(
+        [User(username=f'user{i}', password=hashed, email=f'user{i}@example.com') for i in range(users)],
+        batch_size=batch_size
+    )
+    if not created_users or created_users[0].pk is None:
+        created_users = list(User.objects.filter(username__startswith='user').order_by('pk'))
+    profiles = Profile.objects.bulk_create([
+        Profile(
+            user=user, name=rnd.choice(NAMES), lastname=rnd.choice(LASTNAMES),
+            birth_date=date(rnd.randint(1950, 2004), rnd.randint(1, 12), rnd.randint(1, 28)),
+            address=f'{rnd.choice(WORDS)} g. {rnd.randint(1, 200)}', city=rnd.choice(CITIES), country='Lietuva',
+        ) for user in created_users
+    ], batch_size=batch_size)
+    if profiles and profiles[0].pk is None:
+        profiles = list(Profile.objects.filter(user__in=created_users))
+    amounts = [to_cents(rnd.randint(100, 5000)) for _ in created_users]
+    BalanceLedger.objects.bulk_create([
+        BalanceLedger(user=user, amount=amount, kind=BalanceLedger.TOPUP)
+        for user, amount in zip(created_users, amounts)
+    ], batch_size=batch_size)
+    Balance.objects.bulk_create(
+        [Balance(user=user, cents=amount) for user, amount in zip(created_users, amounts)], batch_size=batch_size
+    )
+
+    Hotel.objects.bulk_create([
+        Hotel(
+            name=f'{rnd.choice(WORDS)} {rnd.choice(CITIES)} {i}'[:30],
+            type=rnd.choice(Hotel.TYPES)[0], stars=rnd.choice(Hotel.STARS)[0],
+            description=f'{rnd.choice(WORDS)} viešbutis, {rnd.choice(CITIES)}',
+            address=f'{rnd.choice(WORDS)} g. {rnd.randint(1, 200)}, {rnd.choice(CITIES)}',
+            price=rnd.randint(20, 300), quantity=rnd.randint(1, 4), availability=rnd.randint(5, 50),
+            external_id=f'seed-{i}',
+        ) for i in range(hotels)
+    ], batch_size=batch_size)
+    bump_catalog_version()
+    hotel_list = list(Hotel.objects.filter(external_id__startswith='seed-'))
+
+    # Užimtumas skaičiuojamas atmintyje, kad nė viena naktis nebūtų perparduota.
+    sold = {}
+    created_orders = 0
+    pending = []
+    for _ in range(orders if hotel_list and profiles else 0):
+        hotel = rnd.choice(hotel_list)
+        r_date = today + timedelta(days=rnd.randint(-60, 300))
+        nights = [r_date + timedelta(days=i) for i in range(rnd.randint(1, 7))]
+        if any(sold.get((hotel.pk, night), 0) >= hotel.availability for night in nights):
+            continue
+        for night in nights:
+            sold[(hotel.pk, night)] = sold.get((hotel.pk, night), 0) + 1
+        pending.append(Order(
+            client=rnd.choice(profiles), hotel=hotel, r_date=r_date, i_date=nights[-1] + timedelta(days=1),
+            status=rnd.choice(Order.STATUS)[0],
+        ))
+        if len(pending) >= batch_size:
+            created_orders += len(create_orders_bulk(pending, batch_size=batch_size))
+            pending = []
+    if pending:
+        created_orders += len(create_orders_bulk(pending, batch_size=batch_size))
+
+    return {
+        'users': len(created_users), 'hotels': len(hotel_list), 'orders': created_orders,
+        'admin': admin.username, 'user': created_users[0].username if created_users else None,
+        'password': password,
+    }
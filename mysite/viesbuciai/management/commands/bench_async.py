@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from viesbuciai.models import BalanceLedger, Hotel, Order
+from ._scratch import use_scratch_database
+
+
+def bench_paths(hotel_id):
+    tomorrow = date.today() + timedelta(days=1)
+    return [
+        '/viesbuciai/hotels/',
+        '/viesbuciai/hotels/filter/?stars=3',
+        '/viesbuciai/myorders/',
+        f'/viesbuciai/hotels/{hotel_id}/availability/?r_date={tomorrow}&i_date={tomorrow + timedelta(days=2)}',
+    ]
+
+
+def summary(mode, latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Palygina sinchroninių (WSGI) ir async (ASGI) skaitymo view'sų pralaidumą "
+            "esant dideliam lygiagretumui. Kiekvienas režimas paleidžiamas atskirame procese.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--hotels', type=int, default=200)
+        parser.add_argument('--db', default=None,
+                            help='SQLite failas (pagal nutylėjimą - laikinas, ištrinamas pabaigoje). '
+                                 'Esamas failas perrašomas tik su --force.')
+        parser.add_argument('--force', action='store_true', help='Ištrinti ir iš naujo sukurti esamą --db failą.')
+        parser.add_argument('--worker', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+        parser.add_argument('--hotel-id', type=int, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.run_worker(options)
+
+        path = use_scratch_database(options['db'], force=options['force'])
+        hotel_id = self.seed(options['hotels'])
+        self.stdout.write(f"Duomenų bazė: {path}")
+
+        results = []
+        for mode, async_views in (('wsgi', '0'), ('asgi', '1')):
+            env = dict(os.environ, VIESBUCIAI_ASYNC_VIEWS=async_views)
+            completed = subprocess.run(
+                [sys.executable, sys.argv[0], 'bench_async', '--worker', mode, '--db', path,
+                 '--concurrency', str(options['concurrency']), '--requests', str(options['requests']),
+                 '--hotel-id', str(hotel_id)],
+                env=env, capture_output=True, text=True
+            )
+            if completed.returncode:
+                raise CommandError(completed.stderr)
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']}: {result['rps']} užkl./s, p50 {result['p50_ms']} ms, "
+                f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, klaidų {result['errors']}"
+            )
+
+    @staticmethod
+    def seed(hotels):
+        user = User.objects.create_user('bench', password='bench')
+        profile_ = user.profile
+        profile_.name = profile_.lastname = profile_.address = profile_.city = profile_.country = 'Bench'
+        profile_.birth_date = date(1990, 1, 1)
+        profile_.save()
+        BalanceLedger.objects.record(user, 100000, BalanceLedger.TOPUP)
+        created = Hotel.objects.bulk_create(
+            [Hotel(name=f'Bench {i}', stars=str(i % 5 + 1), price=50, availability=10) for i in range(hotels)]
+        )
+        today = date.today()
+        Order.objects.bulk_create_with_details(
+            [Order(client=profile_, hotel=hotel, r_date=today, i_date=today + timedelta(days=1)) for hotel in created[:20]]
+        )
+        connections.close_all()
+        return created[0].pk
+
+    def run_worker(self, options):
+        connections['default'].settings_dict['NAME'] = options['db']
+        settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver']
+        user = User.objects.get(username='bench')
+        paths = bench_paths(options['hotel_id'])
+        total = options['requests']
+
+        if options['worker'] == 'wsgi':
+            result = self.run_wsgi(user, paths, total, options['concurrency'])
+        else:
+            result = asyncio.run(self.run_asgi(user, paths, total, options['concurrency']))
+        self.stdout.write(json.dumps(result))
+
+    @staticmethod
+    def run_wsgi(user, paths, total, concurrency):
+        local = threading.local()
+
+        def request(i):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(user)
+            started = time.perf_counter()
+            response = local.client.get(paths[i % len(paths)])
+            return time.perf_counter() - started, response.status_code != 200
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(request, range(total)))
+        elapsed = time.perf_counter() - started
+        return summary('wsgi', [r[0] for r in results], elapsed, sum(r[1] for r in results))
+
+    @staticmethod
+    async def run_asgi(user, paths, total, concurrency):
+        client = AsyncClient()
+        await asyncio.to_thread(client.force_login, user)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                return time.perf_counter() - started, response.status_code != 200
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        return summary('asgi', [r[0] for r in results], elapsed, sum(r[1] for r in results))
+
@@ -0,0 +1,207 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, timedelta
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from viesbuciai import urls
+from viesbuciai.models import Hotel, Order
+from viesbuciai.services import book_hotel
+from ._scratch import use_scratch_database
+from ._seed import seed
+
+# (pavadinimas, url vardas, metodas, kas jungiasi, url argumentai, GET/POST duomenys).
+# Argumentai ir duomenys - funkcijos (ctx, i), kad kiekviena užklausa galėtų skirtis.
+SCENARIOS = (
+    ('index', 'index', 'get', 'user', None, None),
+    ('hotels', 'hotels', 'get', 'user', None, None),
+    ('hotel_filter', 'hotel_filter', 'get', 'user', None, lambda ctx, i: {'stars': str(i % 5 + 1)}),
+    ('hotel_filter_q', 'hotel_filter', 'get', 'user', None, lambda ctx, i: {'q': 'Vilnius'}),
+    ('reservation', 'reservation', 'post', 'user', None, lambda ctx, i: {'hotel': ctx['hotel']}),
+    ('create_order', 'create_order', 'post', 'user', lambda ctx, i: [ctx['hotel']], lambda ctx, i: {
+        'r_date': ctx['today'] + timedelta(days=1 + i % 300), 'i_date': ctx['today'] + timedelta(days=2 + i % 300)
+    }),
+    ('group_reservation', 'group_reservation', 'get', 'user', None, None),
+    ('order_confirmation', 'order_confirmation', 'get', 'user', lambda ctx, i: [ctx['order']], None),
+    ('profile', 'profile', 'get', 'user', None, None),
+    ('register', 'register', 'get', None, None, None),
+    ('my_orders', 'orders', 'get', 'user', None, None),
+    ('orders', 'orders_', 'get', 'admin', None, None),
+    ('orders_filtered', 'orders_', 'get', 'admin', None, lambda ctx, i: {'status': 'p', 'hotel': ctx['hotel']}),
+    ('edit_order', 'edit_order', 'get', 'admin', lambda ctx, i: [ctx['order']], None),
+    ('hotel_availability', 'hotel_availability', 'get', 'user', lambda ctx, i: [ctx['hotel']], lambda ctx, i: {
+        'r_date': ctx['today'] + timedelta(days=1), 'i_date': ctx['today'] + timedelta(days=4)
+    }),
+    ('delete_hotel', 'delete_hotel', 'get', 'admin', lambda ctx, i: [ctx['hotel']], None),
+    ('add_balance', 'add_balance', 'get', 'admin', lambda ctx, i: [ctx['user']], None),
+    ('users', 'all_users', 'get', 'admin', None, None),
+    ('users_search', 'all_users', 'get', 'admin', None, lambda ctx, i: {'q': 'Jon'}),
+    ('add_hotel', 'add_hotel', 'get', 'admin', None, None),
+    ('export_orders', 'export', 'get', 'admin', lambda ctx, i: ['orders'], lambda ctx, i: {'format': 'csv'}),
+    ('daily_report', 'daily_report', 'get', 'admin', None, None),
+    ('api_hotels', 'api_hotels', 'get', None, None, None),
+    ('api_hotel_filter', 'api_hotel_filter', 'get', None, None, lambda ctx, i: {'q': 'Kaunas'}),
+    ('api_hotel', 'api_hotel', 'get', None, lambda ctx, i: [ctx['hotel']], None),
+    ('api_hotel_calendar', 'api_hotel_calendar', 'get', None, lambda ctx, i: [ctx['hotel']],
+     lambda ctx, i: {'months': 12}),
+)
+
+
+def percentile(quantiles, p):
+    return quantiles[p - 1] if quantiles else None
+
+
+def summarize(latencies, queries, statuses):
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(quantiles, 50) * 1000, 3),
+        'p95_ms': round(percentile(quantiles, 95) * 1000, 3),
+        'p99_ms': round(percentile(quantiles, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'rps': round(len(latencies) / sum(latencies), 1),
+        'queries': max(queries),
+        'queries_mean': round(statistics.fmean(queries), 2),
+        'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Sugeneruoja duomenis atskirame SQLite faile ir per Django test client išmatuoja kiekvieną "
+            "viesbuciai/urls.py maršrutą: p50/p95/p99 trukmę, užklausas į DB ir užklausas/s. "
+            "Rezultatai rašomi JSON, juos galima palyginti su ankstesne versija (--compare).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--hotels', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=50, help='Matuojamų užklausų kiekis maršrutui.')
+        parser.add_argument('--warmup', type=int, default=3, help='Nematuojamų užklausų kiekis (cache, jungtys).')
+        parser.add_argument('--only', action='append', help='Tik šis scenarijus (galima kartoti).')
+        parser.add_argument('--output', help='Rezultatų JSON failas.')
+        parser.add_argument('--compare', help='Ankstesnių rezultatų JSON: parodyti skirtumus.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Leistinas p95 pablogėjimas lyginant (0.2 = 20%%).')
+        parser.add_argument('--db', default=None,
+                            help='SQLite failas (pagal nutylėjimą - laikinas, ištrinamas pabaigoje). '
+                                 'Esamas failas perrašomas tik su --force.')
+        parser.add_argument('--force', action='store_true', help='Ištrinti ir iš naujo sukurti esamą --db failą.')
+
+    def handle(self, *args, **options):
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+        path = use_scratch_database(options['db'], force=options['force'])
+        started = time.perf_counter()
+        data = seed(options['users'], options['hotels'], options['orders'], seed=options['seed'])
+        self.stdout.write(f"Duomenų bazė: {path}; sugeneruota per {time.perf_counter() - started:.1f} s: "
+                          f"vartotojų {data['users']}, viešbučių {data['hotels']}, užsakymų {data['orders']}")
+
+        ctx = self.context(data)
+        clients = {None: Client()}
+        for who in ('user', 'admin'):
+            clients[who] = Client()
+            clients[who].force_login(User.objects.get(username=data[who]))
+
+        scenarios = [s for s in SCENARIOS if not options['only'] or s[0] in options['only']]
+        self.report_uncovered()
+
+        results = {}
+        for name, url_name, method, who, args, params in scenarios:
+            client = clients[who]
+            latencies, queries, statuses = [], [], []
+            for i in range(options['warmup'] + options['requests']):
+                url = reverse(url_name, args=args(ctx, i) if args else None)
+                payload = params(ctx, i) if params else None
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = getattr(client, method)(url, payload)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - start
+                if i >= options['warmup']:
+                    latencies.append(elapsed)
+                    queries.append(len(captured))
+                    statuses.append(response.status_code)
+            results[name] = summarize(latencies, queries, statuses)
+            row = results[name]
+            self.stdout.write(
+                f"{name:<22} p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms  "
+                f"p99 {row['p99_ms']:>8.2f} ms  {row['rps']:>8.1f}/s  užklausų {row['queries']:>3}  {row['statuses']}"
+            )
+
+        report = {
+            'meta': {
+                'revision': git_revision(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(), 'django': django.get_version(),
+                'database': connection.vendor, 'seed': options['seed'], 'requests': options['requests'],
+                'data': {key: data[key] for key in ('users', 'hotels', 'orders')},
+            },
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Rezultatai: {options['output']}")
+
+        server_errors = [name for name, row in results.items() if any(int(code) >= 500 for code in row['statuses'])]
+        if server_errors:
+            raise CommandError(f"Serverio klaidos: {', '.join(server_errors)}")
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def context(self, data):
+        """
+        Id'ai, kuriuos naudoja scenarijai: viešbutis, vartotojo užsakymas, vartotojas.
+        """
+        user = User.objects.get(username=data['user'])
+        hotel = Hotel.objects.order_by('pk').first()
+        today = date.today()
+        order = Order.objects.filter(client__user=user).order_by('pk').first()
+        if order is None:
+            order = book_hotel(user, hotel, today + timedelta(days=400), today + timedelta(days=401))
+        return {'hotel': hotel.pk, 'order': order.pk, 'user': user.pk, 'today': today}
+
+    def report_uncovered(self):
+        covered = {url_name for _, url_name, *_ in SCENARIOS}
+        names = {p.name for p in urls.urlpatterns if isinstance(p, URLPattern) and p.name}
+        missing = sorted(names - covered)
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Maršrutai be scenarijaus: {', '.join(missing)}"))
+
+    def compare(self, results, path, threshold):
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)['routes']
+        regressions = []
+        for name, row in results.items():
+            old = baseline.get(name)
+            if old is None:
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0
+            self.stdout.write(f"{name:<22} p95 {old['p95_ms']:>8.2f} -> {row['p95_ms']:>8.2f} ms ({change:+.0%})  "
+                              f"užklausų {old['queries']} -> {row['queries']}")
+            if row['queries'] > old['queries']:
+                regressions.append(f"{name}: užklausų {old['queries']} -> {row['queries']}")
+            elif change > threshold:
+                regressions.append(f"{name}: p95 {change:+.0%}")
+        if regressions:
+            raise CommandError("Regresijos: " + '; '.join(regressions))
+        self.stdout.write(self.style.SUCCESS("Regresijų nerasta."))
@@ -0,0 +1,99 @@
+import multiprocessing
+import time
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import F
+from viesbuciai.models import Balance, BalanceLedger, BookingError, Hotel, HotelNight, Order, to_cents
+from viesbuciai.services import book_hotel
+from ._scratch import use_database_profile
+
+
+def _worker(args):
+    """
+    Vieno proceso rezervacijos. Grąžina (pavyko, atmesta, užrakinta db).
+    """
+    worker_id, attempts, user_ids, hotel_id, r_date, i_date = args
+    connections.close_all()
+    hotel = Hotel.objects.get(pk=hotel_id)
+    users = list(User.objects.filter(pk__in=user_ids))
+    booked = rejected = locked = 0
+    for i in range(attempts):
+        user = users[(worker_id + i) % len(users)]
+        try:
+            book_hotel(user, hotel, r_date, i_date)
+            booked += 1
+        except BookingError:
+            rejected += 1
+        except OperationalError:
+            locked += 1
+    connections.close_all()
+    return booked, rejected, locked
+
+
+class Command(BaseCommand):
+    help = ("Lygiagrečių rezervacijų stress testas atskiroje db (--profile): tikrina, kad "
+            "nėra perpardavimo ir neigiamų balansų, parodo rezervacijų/s.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Procesų kiekis.')
+        parser.add_argument('--attempts', type=int, default=50, help='Bandymų kiekis vienam procesui.')
+        parser.add_argument('--rooms', type=int, default=100, help='Viešbučio kambarių kiekis nakčiai.')
+        parser.add_argument('--users', type=int, default=4)
+        parser.add_argument('--balance', type=float, default=500.0, help='Pradinis kiekvieno vartotojo balansas.')
+        parser.add_argument('--nights', type=int, default=2)
+        parser.add_argument('--db', default=None,
+                            help='SQLite failas (pagal nutylėjimą - laikinas, ištrinamas pabaigoje). '
+                                 'Esamas failas perrašomas tik su --force.')
+        parser.add_argument('--force', action='store_true', help='Ištrinti ir iš naujo sukurti esamą --db failą.')
+        parser.add_argument('--profile', default='dev',
+                            help='Duomenų bazės profilis iš settings.DATABASE_PROFILES (dev, sqlite, postgres).')
+
+    def handle(self, *args, **options):
+        path = use_database_profile(options['profile'], options['db'], force=options['force'])
+        self.stdout.write(f"Duomenų bazė ({options['profile']}): {path}")
+
+        r_date = date.today() + timedelta(days=1)
+        i_date = r_date + timedelta(days=options['nights'])
+        hotel = Hotel.objects.create(name='Stress', price=10, availability=options['rooms'])
+        user_ids = []
+        for i in range(options['users']):
+            user = User.objects.create_user(f'stress{i}', password='stress')
+            BalanceLedger.objects.record(user, to_cents(options['balance']), BalanceLedger.TOPUP)
+            user_ids.append(user.pk)
+        connections.close_all()
+
+        jobs = [(w, options['attempts'], user_ids, hotel.pk, r_date, i_date) for w in range(options['workers'])]
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+            results = pool.map(_worker, jobs)
+        elapsed = time.perf_counter() - started
+
+        booked = sum(r[0] for r in results)
+        rejected = sum(r[1] for r in results)
+        locked = sum(r[2] for r in results)
+        attempts = booked + rejected + locked
+
+        oversold = HotelNight.objects.filter(hotel=hotel, sold__gt=F('capacity')).count()
+        miscounted = HotelNight.objects.filter(hotel=hotel).exclude(sold=booked).count()
+        negative = Balance.objects.filter(cents__lt=0).count()
+        drift = BalanceLedger.objects.reconcile(user_ids, fix=False)
+        orders_ = Order.objects.filter(hotel=hotel).count()
+
+        self.stdout.write(f"Bandymai: {attempts}, pavyko: {booked}, atmesta: {rejected}, db užrakinta: {locked}")
+        self.stdout.write(f"Laikas: {elapsed:.2f} s, {booked / elapsed:.1f} rezervacijų/s, "
+                          f"{attempts / elapsed:.1f} bandymų/s")
+
+        errors = []
+        if oversold:
+            errors.append(f"perparduota nakčių: {oversold}")
+        if miscounted or orders_ != booked:
+            errors.append(f"užsakymų ({orders_}) ir parduotų nakčių neatitikimas")
+        if negative:
+            errors.append(f"neigiamų balansų: {negative}")
+        if drift:
+            errors.append(f"balanso kopija nesutampa su žurnalu: {drift}")
+        if errors:
+            raise CommandError('; '.join(errors))
+        self.stdout.write(self.style.SUCCESS("OK: nėra perpardavimo ir neigiamų balansų."))
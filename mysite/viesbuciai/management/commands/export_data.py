@@ -0,0 +1,31 @@
+import sys
+from django.core.management.base import BaseCommand
+from viesbuciai.exports import EXPORTS, FORMATS, export_rows
+from viesbuciai.models import Order
+
+
+class Command(BaseCommand):
+    help = "Eksportuoja užsakymus arba viešbučius CSV / NDJSON formatu (srautu, pastovi atmintis)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='Failas (pagal nutylėjimą - stdout).')
+        parser.add_argument('--status', choices=[code for code, _ in Order.STATUS])
+        parser.add_argument('--hotel', type=int)
+        parser.add_argument('--date-from', help='Įsiregistravimo data nuo (YYYY-MM-DD).')
+        parser.add_argument('--date-to', help='Įsiregistravimo data iki (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        stream, _ = FORMATS[options['format']]
+        rows = export_rows(
+            options['kind'], status=options['status'], hotel=options['hotel'],
+            date_from=options['date_from'], date_to=options['date_to'],
+        )
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in stream(options['kind'], rows):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,135 @@
+import csv
+import json
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from viesbuciai.models import Hotel
+from viesbuciai.services import HOTEL_IMPORT_FIELDS, upsert_hotels
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+def read_csv(f):
+    for line, row in enumerate(csv.DictReader(f), start=2):
+        yield line, row
+
+
+def read_ndjson(f):
+    for line, text in enumerate(f, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else {'_raw': text.rstrip('\n')}
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def hotel_from_row(row, exists=False):
+    """
+    Viešbutis iš importo eilutės, patikrintas tomis pačiomis taisyklėmis kaip
+    formoje: laukų tipai, TYPES/STARS reikšmės, quantity <= 4 (clean_fields)
+    ir Hotel.clean (neneigiama kaina ir kiekis).
+    :param exists: ar viešbutis su šiuo external_id jau yra. Esamam trūkstami
+    stulpeliai neimportuojami (lieka esamos reikšmės), todėl netikrinami. Naujam
+    jie būtų numatytosios reikšmės - netinkamos (pvz. stars) reiškia privalomą stulpelį.
+    :return: (Hotel, eilutėje buvę HOTEL_IMPORT_FIELDS laukai).
+    :raise ValidationError: eilutė netinkama.
+    """
+    if not row.get('external_id'):
+        raise ValidationError({'external_id': ['Privalomas laukas.']})
+    values = {field: row[field] for field in HOTEL_IMPORT_FIELDS if field in row}
+    hotel = Hotel(external_id=str(row['external_id']), **values)
+    missing = [field for field in HOTEL_IMPORT_FIELDS if field not in values]
+    errors = {}
+    try:
+        hotel.clean_fields(exclude=missing if exists else None)
+    except ValidationError as error:
+        errors = error.update_error_dict(errors)
+    for field in missing:
+        if field in errors:
+            errors[field] = ['Privalomas stulpelis naujam viešbučiui.']
+    # Hotel.clean lygina skaičius, todėl kviečiamas tik kai jie yra ir teisingo tipo.
+    if (
+        'price' not in errors and 'availability' not in errors
+        and hotel.price is not None and hotel.availability is not None
+    ):
+        try:
+            hotel.clean()
+        except ValidationError as error:
+            errors = error.update_error_dict(errors)
+    if errors:
+        raise ValidationError(errors)
+    return hotel, tuple(values)
+
+
+def error_text(error):
+    if hasattr(error, 'error_dict'):
+        return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+class Command(BaseCommand):
+    help = ("Viešbučių importas iš CSV arba NDJSON (external_id, name, type, stars, description, "
+            "address, price, quantity, availability). Failas skaitomas srautu, grupės tikrinamos "
+            "ir įrašomos bulk_create/bulk_update pagal external_id (esamiems keičiami tik faile "
+            "esantys stulpeliai, naujiems reikia ir stars). Netinkamos eilutės "
+            "surašomos į atmestų eilučių failą.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Numatyta - pagal failo plėtinį.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--rejects', help='Atmestų eilučių CSV (numatyta - <path>.rejects.csv).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        rejects_path = options['rejects'] or f"{path}.rejects.csv"
+        created = updated = rejected = 0
+        rejects = writer = None
+
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = READERS[import_format](f)
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+
+                    # Viena užklausa grupei: kurie external_id jau importuoti.
+                    existing = set(Hotel.objects.filter(
+                        external_id__in=[str(row['external_id']) for _, row in batch if row.get('external_id')]
+                    ).values_list('external_id', flat=True))
+
+                    hotels_ = []
+                    for line, row in batch:
+                        try:
+                            if '_raw' in row:
+                                raise ValidationError('Neteisingas JSON objektas.')
+                            hotels_.append(hotel_from_row(row, exists=str(row.get('external_id')) in existing))
+                        except ValidationError as error:
+                            if writer is None:
+                                rejects = open(rejects_path, 'w', newline='', encoding='utf-8')
+                                writer = csv.writer(rejects)
+                                writer.writerow(['line', 'error', 'row'])
+                            writer.writerow([line, error_text(error), json.dumps(row, ensure_ascii=False)])
+                            rejected += 1
+
+                    batch_created, batch_updated = upsert_hotels(hotels_, batch_size=options['batch_size'])
+                    created += batch_created
+                    updated += batch_updated
+        except FileNotFoundError:
+            raise CommandError(f"Failas nerastas: {path}")
+        finally:
+            if rejects is not None:
+                rejects.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sukurta viešbučių: {created}, atnaujinta: {updated}, atmesta: {rejected}."
+        ))
+        if rejected:
+            self.stdout.write(f"Atmestos eilutės: {rejects_path}")
@@ -0,0 +1,81 @@
+import csv
+from datetime import date
+from itertools import islice
+from django.core.management.base import BaseCommand
+from viesbuciai.models import BookingError, Hotel, Order, Profile
+from viesbuciai.services import create_orders_bulk
+
+
+class Command(BaseCommand):
+    help = ("Užsakymų importas iš CSV (username, hotel_id, r_date, i_date[, status]). "
+            "Kiekviena grupė įrašoma bulk_create vienoje transakcijoje; jeigu grupėje yra "
+            "užsakymų pilnoms naktims, grupė įrašoma po vieną ir atmetamos tik tos eilutės.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-reserve', action='store_true',
+                            help='Nemažinti nakčių prieinamumo (Order.reserved=False, ištrynus neatlaisvinama).')
+
+    def handle(self, *args, **options):
+        created = skipped = 0
+        statuses = {code for code, _ in Order.STATUS}
+
+        with open(options['path'], newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            while True:
+                batch = list(islice(reader, options['batch_size']))
+                if not batch:
+                    break
+
+                profiles = dict(Profile.objects.filter(
+                    user__username__in={row['username'] for row in batch}
+                ).values_list('user__username', 'id'))
+                hotels_ = Hotel.objects.in_bulk({row['hotel_id'] for row in batch if row['hotel_id'].isdigit()})
+
+                orders_ = []
+                for line, row in enumerate(batch, start=created + skipped + 2):
+                    try:
+                        order = Order(
+                            client_id=profiles[row['username']],
+                            hotel=hotels_[int(row['hotel_id'])],
+                            r_date=date.fromisoformat(row['r_date']),
+                            i_date=date.fromisoformat(row['i_date']),
+                            status=row.get('status') or 'u',
+                        )
+                    except (KeyError, ValueError):
+                        self.stderr.write(f"Eilutė {line}: neteisingi duomenys {row}")
+                        skipped += 1
+                        continue
+                    if order.i_date <= order.r_date or order.status not in statuses:
+                        self.stderr.write(f"Eilutė {line}: neteisingos datos arba statusas {row}")
+                        skipped += 1
+                        continue
+                    orders_.append((line, row, order))
+
+                batch_created = self.create(orders_, not options['no_reserve'], options['batch_size'])
+                created += batch_created
+                skipped += len(orders_) - batch_created
+
+        self.stdout.write(self.style.SUCCESS(f"Sukurta užsakymų: {created}, praleista: {skipped}."))
+
+    def create(self, orders_, reserve, batch_size):
+        """
+        Įrašo grupę vienu create_orders_bulk. Jeigu kuri nors naktis pilna
+        (BookingError), grupė įrašoma po vieną užsakymą ir atmetamos tik
+        netelpančios eilutės.
+        :return: sukurtų užsakymų kiekis.
+        """
+        try:
+            return len(create_orders_bulk([order for _, _, order in orders_], reserve=reserve, batch_size=batch_size))
+        except BookingError:
+            pass
+
+        created = 0
+        for line, row, order in orders_:
+            try:
+                create_orders_bulk([order], reserve=reserve)
+                created += 1
+            except BookingError:
+                self.stderr.write(f"Eilutė {line}: nėra laisvų vietų {row}")
+        return created
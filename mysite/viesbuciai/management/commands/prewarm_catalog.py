@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from viesbuciai import catalog
+
+
+class Command(BaseCommand):
+    help = "Užpildo viešbučių katalogo cache (naudoti po diegimo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=10, help='Kiek pirmųjų puslapių paruošti.')
+
+    def handle(self, *args, **options):
+        warmed = catalog.prewarm(pages=options['pages'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Katalogo versija {catalog.catalog_version()}: paruošta puslapių {warmed}."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from viesbuciai.models import Hotel
+from viesbuciai.reports import rebuild_hotel_stats
+
+
+class Command(BaseCommand):
+    help = ("Perskaičiuoja viešbučių dienos suvestinę (DailyHotelStats) iš užsakymų. "
+            "Kiekvienas viešbutis apdorojamas atskira trumpa transakcija, todėl "
+            "DB neužrakinama visam perskaičiavimui.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotel', type=int, action='append', dest='hotels', help='Tik šis viešbutis (galima kartoti).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Eilučių kiekis viename bulk_create.')
+
+    def handle(self, *args, **options):
+        hotels_ = Hotel.objects.order_by('pk')
+        if options['hotels']:
+            hotels_ = hotels_.filter(pk__in=options['hotels'])
+
+        rebuilt = days = 0
+        for hotel in hotels_.iterator():
+            days += rebuild_hotel_stats(hotel, batch_size=options['batch_size'])
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Perskaičiuota viešbučių: {rebuilt}, dienų: {days}."))
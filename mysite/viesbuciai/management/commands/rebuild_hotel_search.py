@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from viesbuciai.search import drop_fts, install_fts
+
+
+class Command(BaseCommand):
+    help = ("Atkuria viešbučių pilno teksto paieškos (FTS5) lentelę, trigerius ir indeksą: "
+            "esami ištrinami ir sukuriami iš naujo pagal search.py (vienoje transakcijoje).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Pilno teksto indeksas naudojamas tik su SQLite.")
+        with transaction.atomic():
+            drop_fts()
+            install_fts()
+        self.stdout.write(self.style.SUCCESS("Paieškos indeksas perkurtas."))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from viesbuciai.middleware import invalidate_profile_context
+from viesbuciai.models import BalanceLedger
+
+
+class Command(BaseCommand):
+    help = ("Sutikrina Balance kopijas su BalanceLedger įrašų suma. Vartotojai "
+            "apdorojami grupėmis pagal id, todėl atmintis nepriklauso nuo įrašų kiekio.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Vartotojų kiekis vienoje grupėje.')
+        parser.add_argument('--dry-run', action='store_true', help='Tik parodyti neatitikimus, nieko nekeisti.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fix = not options['dry_run']
+        last_id = 0
+        checked = drifted = 0
+
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            drift = BalanceLedger.objects.reconcile(user_ids, fix=fix)
+            for user_id, was, expected in drift:
+                self.stdout.write(f"Vartotojas {user_id}: {was} -> {expected}")
+                if fix:
+                    invalidate_profile_context(user_id)
+            checked += len(user_ids)
+            drifted += len(drift)
+            last_id = user_ids[-1]
+
+        action = "pataisyta" if fix else "rasta"
+        self.stdout.write(self.style.SUCCESS(f"Patikrinta vartotojų: {checked}, neatitikimų {action}: {drifted}."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from ._scratch import use_scratch_database
+from ._seed import seed
+
+
+class Command(BaseCommand):
+    help = ("Sugeneruoja atkuriamus bandomuosius duomenis (vartotojai su profiliais ir balansais, "
+            "viešbučiai, užsakymai) atskirame SQLite faile.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--hotels', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Atsitiktinių skaičių sėkla.')
+        parser.add_argument('--db', default=None,
+                            help='SQLite failas (pagal nutylėjimą - laikinas, paliekamas; kelias išvedamas). '
+                                 'Esamas failas perrašomas tik su --force.')
+        parser.add_argument('--force', action='store_true', help='Ištrinti ir iš naujo sukurti esamą --db failą.')
+
+    def handle(self, *args, **options):
+        path = use_scratch_database(options['db'], force=options['force'], keep=True)
+        summary = seed(options['users'], options['hotels'], options['orders'], seed=options['seed'])
+        self.stdout.write(f"Duomenų bazė: {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Sukurta vartotojų: {summary['users']}, viešbučių: {summary['hotels']}, "
+            f"užsakymų: {summary['orders']} (slaptažodis: {summary['password']})."
+        ))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ("Nukopijuoja pagrindinę SQLite db į DATABASE_REPLICAS failus (sqlite3 backup). "
+            "Lokaliam replikų maršrutizavimo tikrinimui: tarp kopijavimų replikos atsilieka.")
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError("Replikas kopijuoti galima tik SQLite profiliuose.")
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("Nenurodyta nė viena replika (VIESBUCIAI_DB_REPLICAS).")
+
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            replica.close()
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            replica.close()
+            self.stdout.write(f"{alias}: {replica.settings_dict['NAME']}")
+        self.stdout.write(self.style.SUCCESS("Replikos atnaujintos."))
@@ -0,0 +1,472 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+from decimal import Decimal
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, load_backend
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db.models import OuterRef, Subquery
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+from .models import Balance, Profile
+from . import nplusone, routers, timing
+from .caching import cache_is_shared
+from .storage import static_root_index
+
+timing_logger = logging.getLogger('viesbuciai.timing')
+nplusone_logger = logging.getLogger('viesbuciai.nplusone')
+
+PROFILE_CONTEXT_TIMEOUT = 60 * 15
+USER_CACHE_TIMEOUT = 60 * 15
+REPLICA_STICKY_COOKIE = 'viesbuciai_primary'
+STATIC_IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+STATIC_CACHE = 'public, max-age=60'
+
+
+def profile_context_key(user_id):
+    return f"viesbuciai:profile_context:{user_id}"
+
+
+def invalidate_profile_context(user_id):
+    cache.delete(profile_context_key(user_id))
+
+
+def user_cache_key(user_id):
+    return f"viesbuciai:user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class ProfileContext:
+    """
+    Prisijungusio vartotojo profilio užpildymo požymis ir balanso likutis.
+    Laikomas cache, kad kiekvienas puslapis neskaitytų Profile ir Balance lentelių.
+    """
+
+    def __init__(self, complete, cents):
+        self.complete = complete
+        self.cents = cents
+
+    @property
+    def balance(self):
+        return Decimal(self.cents) / 100
+
+
+def load_profile_context(user):
+    """
+    Grąžina vartotojo ProfileContext iš cache, o jo nesant -
+    viena užklausa (profilis + balanso subquery) ir įrašo į cache.
+    """
+    key = profile_context_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return ProfileContext(*cached)
+
+    # Savo balansas visada skaitomas iš pagrindinės db (ir nekuriamas antras).
+    balance = Balance.objects.filter(user=OuterRef('user')).values('cents')[:1]
+    with routers.use_primary():
+        profile_ = Profile.objects.annotate(cents=Subquery(balance)).get(user=user)
+
+    # Naujas vartotojas be balanco
+    if profile_.cents is None:
+        Balance.objects.get_or_create(user=user)
+        profile_.cents = 0
+
+    cached = (profile_.is_complete, profile_.cents)
+    cache.set(key, cached, PROFILE_CONTEXT_TIMEOUT)
+    return ProfileContext(*cached)
+
+
+async def aload_profile_context(user):
+    """
+    load_profile_context async versija (async ORM ir cache).
+    """
+    key = profile_context_key(user.pk)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return ProfileContext(*cached)
+
+    balance = Balance.objects.filter(user=OuterRef('user')).values('cents')[:1]
+    with routers.use_primary():
+        profile_ = await Profile.objects.annotate(cents=Subquery(balance)).aget(user=user)
+
+    if profile_.cents is None:
+        await Balance.objects.aget_or_create(user=user)
+        profile_.cents = 0
+
+    cached = (profile_.is_complete, profile_.cents)
+    await cache.aset(key, cached, PROFILE_CONTEXT_TIMEOUT)
+    return ProfileContext(*cached)
+
+
+def load_cached_user(request):
+    """
+    django.contrib.auth.get_user, tik vartotojas (kartu su profiliu) imamas
+    iš cache. Viena cache.get_many užklausa grąžina ir vartotoją, ir jo
+    ProfileContext (išsaugomas request._profile_context). Sesijos hash ir
+    is_active tikrinami kaip Django, todėl pakeitus slaptažodį sesija baigiasi.
+    """
+    try:
+        user_id = User._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    user_key, profile_key = user_cache_key(user_id), profile_context_key(user_id)
+    cached = cache.get_many([user_key, profile_key])
+    user = cached.get(user_key)
+    if user is None:
+        # Iš pagrindinės db: atsilikusios replikos slaptažodžio hash ar is_active neturi patekti į cache.
+        with routers.use_primary():
+            user = User.objects.select_related('profile').filter(pk=user_id).first()
+        if user is None:
+            return AnonymousUser()
+        cache.set(user_key, user, USER_CACHE_TIMEOUT)
+
+    backend = load_backend(backend_path)
+    if hasattr(backend, 'user_can_authenticate') and not backend.user_can_authenticate(user):
+        return AnonymousUser()
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(session_hash, user.get_session_auth_hash()):
+        request.session.flush()
+        return AnonymousUser()
+
+    user.backend = backend_path
+    if profile_key in cached:
+        request._profile_context = cached[profile_key]
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware, kuris request.user (su profiliu) ima iš cache
+    (load_cached_user). Cache išvalomas signalais išsaugojus User ar Profile
+    (žr. views.py). Kartu su cached_db sesijomis prisijungusio vartotojo
+    užklausa nebeskaito django_session, auth_user ir viesbuciai_profile.
+    Veikia tik su bendru cache (žr. checks.py), kitaip - ImproperlyConfigured.
+    """
+
+    def __init__(self, get_response):
+        if not cache_is_shared():
+            raise ImproperlyConfigured(
+                "CachedAuthenticationMiddleware reikalauja bendro cache (VIESBUCIAI_CACHE_URL), ne "
+                f"{settings.CACHES['default']['BACKEND']}."
+            )
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: load_cached_user(request))
+
+    async def __acall__(self, request):
+        # process_request tik priskiria lazy objektą - gija sync_to_async nereikalinga.
+        self.process_request(request)
+        return await self.get_response(request)
+
+
+class ProfileContextMiddleware:
+    """
+    Prideda request.profile_context (ProfileContext arba None neprisijungusiam).
+    Kraunama tik pirmą kartą panaudojus. Cache išvalomas signalais (žr. views.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request.profile_context = SimpleLazyObject(lambda: self._load(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Async view'sai naudoja aload_profile_context, sync - šį lazy objektą.
+        request.profile_context = SimpleLazyObject(lambda: self._load(request))
+        return await self.get_response(request)
+
+    @staticmethod
+    def _load(request):
+        if not request.user.is_authenticated:
+            return None
+        # CachedAuthenticationMiddleware jau gavo jį kartu su vartotoju.
+        cached = getattr(request, '_profile_context', None)
+        if cached is not None:
+            return ProfileContext(*cached)
+        return load_profile_context(request.user)
+
+
+class ServerTimingMiddleware:
+    """
+    Prideda Server-Timing antraštę (DB užklausų kiekis ir laikas, šablonų
+    atvaizdavimas, likęs programos laikas, bendras laikas), matomą naršyklės
+    devtools. Matuojama SERVER_TIMING_SAMPLE_RATE dalis užklausų; įjungus
+    SERVER_TIMING_LOG rašoma ir JSON eilutė į 'viesbuciai.timing' logerį.
+    Dedamas prieš kitus MIDDLEWARE (po SecurityMiddleware ir CompressedStaticMiddleware).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 1.0)
+        self.log = getattr(settings, 'SERVER_TIMING_LOG', False)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        timings, token = timing.start()
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        timings, token = timing.start()
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.stop(token)
+        return self.finish(request, response, timings, started)
+
+    def finish(self, request, response, timings, started):
+        timings.total = perf_counter() - started
+        response['Server-Timing'] = timings.header()
+        if self.log:
+            match = request.resolver_match
+            timing_logger.info(json.dumps({
+                'view': match.view_name if match else None,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **timings.as_dict(),
+            }))
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    N+1 detektorius: užklausos metu skaičiuoja SELECT formas (be reikšmių) ir,
+    jeigu ta pati forma įvykdyta daugiau nei NPLUSONE_THRESHOLD kartų,
+    praneša view'są, šablono eilutę ir kvietimų steką. Produkcijoje rašoma
+    į 'viesbuciai.nplusone' logerį, testuose (NPLUSONE_RAISE) keliama
+    NPlusOneError, todėl testas nepavyksta.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NPLUSONE_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.threshold = getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+        self.raise_errors = getattr(settings, 'NPLUSONE_RAISE', False)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        shapes, token = nplusone.start(self.threshold)
+        try:
+            response = self.get_response(request)
+        finally:
+            nplusone.stop(token)
+        return self.report(request, response, shapes)
+
+    async def __acall__(self, request):
+        shapes, token = nplusone.start(self.threshold)
+        try:
+            response = await self.get_response(request)
+        finally:
+            nplusone.stop(token)
+        return self.report(request, response, shapes)
+
+    def report(self, request, response, shapes):
+        problems = shapes.problems()
+        if problems:
+            match = request.resolver_match
+            view = f"{match.func.__module__}.{match.func.__name__}" if match else None
+            if self.raise_errors:
+                details = '\n'.join(
+                    f"{p['count']}x {p['shape']}\n  šablonas: {p['template']}\n  " + '\n  '.join(p['stack'])
+                    for p in problems
+                )
+                raise nplusone.NPlusOneError(f"N+1 užklausos {view} ({request.path}):\n{details}")
+            for problem in problems:
+                nplusone_logger.warning(json.dumps({'view': view, 'path': request.path, **problem}))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Skaitymų maršrutizavimas į replikas (žr. routers.ReplicaRouter): replica_reads
+    view'sų GET/HEAD skaitymai eina į repliką. Po bet kokio rašymo klientui
+    REPLICA_STICKY_SECONDS nustatomas slapukas, ir jo užklausos skaitomos iš
+    pagrindinės db - ką tik užsakęs vartotojas mato savo užsakymą.
+    Be DATABASE_REPLICAS neįjungiamas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state, token = routers.start(request, sticky=REPLICA_STICKY_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.stop(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state, token = routers.start(request, sticky=REPLICA_STICKY_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.stop(token)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                REPLICA_STICKY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def accept_encoding_qualities(header):
+    """
+    Accept-Encoding koduotės ir jų q reikšmės ({'br': 1.0, 'gzip': 0.5}).
+    q=0 reiškia, kad koduotė atmesta.
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+class CompressedStaticMiddleware:
+    """
+    Atiduoda STATIC_URL failus iš STATIC_ROOT be atskiro web serverio.
+    Failai su turinio hash (staticfiles.json) kešuojami metams (immutable),
+    todėl pakartotinai kraunant puslapį naršyklė jų neklausia. Pagal
+    Accept-Encoding atiduodama .br arba .gz kopija (žr. storage.py).
+    Failų sąrašas sudaromas paleidžiant procesą; be collectstatic neįjungiamas.
+    Dedamas iškart po SecurityMiddleware, kad ir statiniai atsakymai gautų
+    jo antraštes (nosniff, HSTS), bet prieš kitus MIDDLEWARE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        root = settings.STATIC_ROOT
+        manifest = os.path.join(root, 'staticfiles.json') if root else None
+        if not manifest or not os.path.isfile(manifest):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.files = static_root_index(root)
+        with open(manifest, encoding='utf-8') as f:
+            self.immutable = set(json.load(f)['paths'].values())
+
+    def static_file(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None, None
+        name = request.path_info[len(self.prefix):]
+        return name, self.files.get(name)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        name, variants = self.static_file(request)
+        if variants is None:
+            return self.get_response(request)
+        return self.serve(request, name, variants)
+
+    async def __acall__(self, request):
+        name, variants = self.static_file(request)
+        if variants is None:
+            return await self.get_response(request)
+        return self.serve(request, name, variants)
+
+    def serve(self, request, name, variants):
+        path, encoding, best = variants[''], None, 0.0
+        # Didžiausia q laimi, vienodų - br. Neišvardinta koduotė priimama pagal '*'.
+        qualities = accept_encoding_qualities(request.headers.get('Accept-Encoding', ''))
+        for candidate in ('br', 'gzip'):
+            quality = qualities.get(candidate, qualities.get('*', 0.0))
+            if candidate in variants and quality > best:
+                path, encoding, best = variants[candidate], candidate, quality
+
+        stat = os.stat(path)
+        if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(name)
+            response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+            response['Last-Modified'] = http_date(stat.st_mtime)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Cache-Control'] = STATIC_IMMUTABLE_CACHE if name in self.immutable else STATIC_CACHE
+        if len(variants) > 1:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
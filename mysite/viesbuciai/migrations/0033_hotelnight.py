@@ -0,0 +1,31 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0032_alter_profile_birth_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Nakties_data')),
+                ('capacity', models.PositiveIntegerField(verbose_name='Talpa')),
+                ('sold', models.PositiveIntegerField(default=0, verbose_name='Parduota')),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='viesbuciai.hotel')),
+            ],
+            options={
+                'ordering': ['hotel', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hotelnight',
+            constraint=models.UniqueConstraint(fields=('hotel', 'date'), name='unique_hotel_night'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def balances_to_ledger(apps, schema_editor):
+    # Esami float likučiai tampa pradiniais papildymo įrašais centais.
+    Balance = apps.get_model('viesbuciai', 'Balance')
+    BalanceLedger = apps.get_model('viesbuciai', 'BalanceLedger')
+    entries = []
+    for balance in Balance.objects.exclude(user=None):
+        balance.cents = int((Decimal(str(balance.balance)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+        balance.save(update_fields=['cents'])
+        if balance.cents:
+            entries.append(BalanceLedger(user_id=balance.user_id, kind='t', amount=balance.cents))
+    BalanceLedger.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('viesbuciai', '0033_hotelnight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balance',
+            name='cents',
+            field=models.BigIntegerField(default=0, verbose_name='Balance_centais'),
+        ),
+        migrations.CreateModel(
+            name='BalanceLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('t', 'Papildymas'), ('c', 'Uzsakymo mokestis'), ('r', 'Grazinimas')], max_length=1)),
+                ('amount', models.BigIntegerField(verbose_name='Suma_centais')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Sukurta')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='viesbuciai.order')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='balanceledger',
+            index=models.Index(fields=['user', 'amount'], name='ledger_user_amount_idx'),
+        ),
+        migrations.RunPython(balances_to_ledger, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='balance',
+            name='balance',
+        ),
+    ]
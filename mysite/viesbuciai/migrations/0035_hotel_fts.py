@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Migracija nepriklauso nuo viesbuciai.search: lentelė ir trigeriai tokie,
+# kokie buvo sukurti šioje versijoje.
+FTS_INSTALL_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS viesbuciai_hotel_fts USING fts5(
+        name, description, address,
+        content='viesbuciai_hotel', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS viesbuciai_hotel_fts_ai AFTER INSERT ON viesbuciai_hotel BEGIN
+        INSERT INTO viesbuciai_hotel_fts(rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS viesbuciai_hotel_fts_ad AFTER DELETE ON viesbuciai_hotel BEGIN
+        INSERT INTO viesbuciai_hotel_fts(viesbuciai_hotel_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS viesbuciai_hotel_fts_au AFTER UPDATE ON viesbuciai_hotel BEGIN
+        INSERT INTO viesbuciai_hotel_fts(viesbuciai_hotel_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+        INSERT INTO viesbuciai_hotel_fts(rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END""",
+    "INSERT INTO viesbuciai_hotel_fts(viesbuciai_hotel_fts) VALUES ('rebuild')",
+]
+
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS viesbuciai_hotel_fts_ai",
+    "DROP TRIGGER IF EXISTS viesbuciai_hotel_fts_ad",
+    "DROP TRIGGER IF EXISTS viesbuciai_hotel_fts_au",
+    "DROP TABLE IF EXISTS viesbuciai_hotel_fts",
+]
+
+
+def install(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_INSTALL_SQL:
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0034_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
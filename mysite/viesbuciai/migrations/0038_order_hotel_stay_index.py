@@ -0,0 +1,17 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0037_profile_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['hotel', 'r_date', 'i_date'], name='order_hotel_stay_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0038_order_hotel_stay_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHotelStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('capacity', models.PositiveIntegerField(verbose_name='Talpa')),
+                ('rooms_sold', models.IntegerField(default=0, verbose_name='Parduota')),
+                ('revenue_cents', models.BigIntegerField(default=0, verbose_name='Pajamos_centais')),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='viesbuciai.hotel')),
+            ],
+            options={
+                'ordering': ['hotel', 'date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailyhotelstats',
+            index=models.Index(fields=['date', 'hotel'], name='daily_stats_date_hotel_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyhotelstats',
+            constraint=models.UniqueConstraint(fields=('hotel', 'date'), name='unique_hotel_daily_stats'),
+        ),
+    ]
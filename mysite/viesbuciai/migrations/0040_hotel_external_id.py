@@ -0,0 +1,48 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+# SQLite lentelės perkūrimas (unikalus stulpelis) ištrina FTS trigerius -
+# jie sukuriami iš naujo (kaip 0035_hotel_fts) ir indeksas perkuriamas.
+FTS_TRIGGERS_SQL = [
+    """CREATE TRIGGER IF NOT EXISTS viesbuciai_hotel_fts_ai AFTER INSERT ON viesbuciai_hotel BEGIN
+        INSERT INTO viesbuciai_hotel_fts(rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS viesbuciai_hotel_fts_ad AFTER DELETE ON viesbuciai_hotel BEGIN
+        INSERT INTO viesbuciai_hotel_fts(viesbuciai_hotel_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS viesbuciai_hotel_fts_au AFTER UPDATE ON viesbuciai_hotel BEGIN
+        INSERT INTO viesbuciai_hotel_fts(viesbuciai_hotel_fts, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+        INSERT INTO viesbuciai_hotel_fts(rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END""",
+    "INSERT INTO viesbuciai_hotel_fts(viesbuciai_hotel_fts) VALUES ('rebuild')",
+]
+
+
+def install(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_TRIGGERS_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0039_daily_hotel_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, install),
+        migrations.AddField(
+            model_name='hotel',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Isorinis_id'),
+        ),
+        migrations.RunPython(install, migrations.RunPython.noop),
+    ]
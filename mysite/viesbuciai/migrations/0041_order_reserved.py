@@ -0,0 +1,18 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0040_hotel_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reserved',
+            field=models.BooleanField(default=True, verbose_name='Rezervuota'),
+        ),
+    ]
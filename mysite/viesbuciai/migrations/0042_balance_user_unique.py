@@ -0,0 +1,38 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def merge_duplicate_balances(apps, schema_editor):
+    # Vartotojui paliekama viena kopija, jos likutis - visų jo žurnalo įrašų suma.
+    Balance = apps.get_model('viesbuciai', 'Balance')
+    BalanceLedger = apps.get_model('viesbuciai', 'BalanceLedger')
+    duplicated = list(
+        Balance.objects.exclude(user=None).order_by().values('user_id')
+        .annotate(n=Count('id')).filter(n__gt=1).values_list('user_id', flat=True)
+    )
+    for user_id in duplicated:
+        keep, *extra = Balance.objects.filter(user_id=user_id).order_by('id')
+        Balance.objects.filter(id__in=[b.id for b in extra]).delete()
+        total = BalanceLedger.objects.filter(user_id=user_id).aggregate(total=Sum('amount'))['total']
+        Balance.objects.filter(id=keep.id).update(cents=total or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('viesbuciai', '0041_order_reserved'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_balances, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='balance',
+            name='user',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:51
+
+from django.db import migrations, models
+from decimal import Decimal, ROUND_HALF_UP
+
+
+def backfill_price_cents(apps, schema_editor):
+    # Esamiems užsakymams užsakymo metu galiojusi kaina nežinoma - imama dabartinė.
+    Hotel = apps.get_model('viesbuciai', 'Hotel')
+    Order = apps.get_model('viesbuciai', 'Order')
+    for hotel_id, price in Hotel.objects.values_list('id', 'price'):
+        cents = int((Decimal(str(price or 0)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+        Order.objects.filter(hotel_id=hotel_id, price_cents=None).update(price_cents=cents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0042_balance_user_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='price_cents',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Nakties_kaina_centais'),
+        ),
+        migrations.RunPython(backfill_price_cents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:55
+
+from collections import Counter
+from datetime import timedelta
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_hotel_nights(apps, schema_editor):
+    # Užsakymai iki HotelNight (ir sukurti per admin) nakčių neužėmė -
+    # sold perskaičiuojamas iš visų rezervuotų užsakymų.
+    Hotel = apps.get_model('viesbuciai', 'Hotel')
+    HotelNight = apps.get_model('viesbuciai', 'HotelNight')
+    Order = apps.get_model('viesbuciai', 'Order')
+    for hotel in Hotel.objects.order_by('pk').iterator():
+        sold = Counter()
+        stays = Order.objects.filter(
+            hotel=hotel, reserved=True, r_date__isnull=False, i_date__isnull=False
+        ).values_list('r_date', 'i_date').annotate(n=Count('id')).order_by()
+        for r_date, i_date, n in stays.iterator():
+            for offset in range((i_date - r_date).days):
+                sold[r_date + timedelta(days=offset)] += n
+
+        changed = []
+        for night in HotelNight.objects.filter(hotel=hotel):
+            rooms = sold.pop(night.date, 0)
+            if night.sold != rooms:
+                night.sold = rooms
+                changed.append(night)
+        HotelNight.objects.bulk_update(changed, ['sold'], batch_size=500)
+        HotelNight.objects.bulk_create(
+            [HotelNight(hotel=hotel, date=night, capacity=hotel.availability, sold=rooms)
+             for night, rooms in sold.items()],
+            batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viesbuciai', '0043_order_price_cents'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_hotel_nights, migrations.RunPython.noop),
+    ]
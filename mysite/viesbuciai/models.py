@@ -1,4 +1,9 @@
-from django.db import models
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, Sum
+from django.db.models.functions import Cast, NullIf
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -18,23 +23,158 @@ class Profile(models.Model):
     city = models.CharField("Miestas", max_length=20, null=True, blank=True)
     country = models.CharField("Salis", max_length=30, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='profile_name_idx'),
+            models.Index(fields=['lastname'], name='profile_lastname_idx'),
+            models.Index(fields=['city'], name='profile_city_idx'),
+        ]
+
+    @property
+    def is_complete(self):
+        """
+        Ar užpildyti visi laukai, reikalingi viešbučių užsakymui.
+        """
+        return bool(self.name and self.lastname and self.address and
+                    self.birth_date and self.city and self.country)
+
     def __str__(self):
         return f"{self.name} {self.lastname}"
 
 
+def to_cents(amount):
+    """
+    Sumą eurais (float, str, Decimal) paverčia sveikais centais.
+    """
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
 class Balance(models.Model):
 
     """
     Balanco likutis yra pririštas per ryšį su userio autorizacija iš django lentelės.
+    Tai tik momentinė BalanceLedger įrašų sumos kopija (centais), atnaujinama
+    kartu su kiekvienu nauju įrašu. Tiesiogiai nekeičiama.
     """
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
-    balance = models.FloatField("Balance", max_length=10, default=0)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True)
+    cents = models.BigIntegerField("Balance_centais", default=0)
+
+    @property
+    def balance(self):
+        return Decimal(self.cents) / 100
 
     def __str__(self):
         return f"{self.user} {self.balance}"
 
 
+class BalanceLedgerManager(models.Manager):
+
+    def record(self, user, amount, kind, order=None, require_funds=False):
+        """
+        Prideda įrašą ir tame pačiame sakinyje atnaujina Balance kopiją.
+        :param amount: suma centais (neigiama - nurašymas).
+        :param require_funds: nurašyti tik jeigu likučio pakanka, kitaip InsufficientBalance.
+        :return: sukurtas BalanceLedger įrašas.
+        """
+        user_id = getattr(user, 'pk', user)
+        with transaction.atomic():
+            self._update_snapshot(user_id, amount, require_funds)
+            return self.create(user_id=user_id, amount=amount, kind=kind, order=order)
+
+    def record_many(self, user, amounts, kind, require_funds=False):
+        """
+        Daug to paties vartotojo įrašų (pvz. grupinės rezervacijos mokestis -
+        po įrašą kiekvienam užsakymui). Balance kopija atnaujinama vienu
+        sakiniu visai sumai, įrašai - bulk_create (post_save nesiunčiamas).
+        :param amounts: (suma centais, order) poros.
+        :return: sukurti BalanceLedger įrašai.
+        """
+        user_id = getattr(user, 'pk', user)
+        amounts = list(amounts)
+        with transaction.atomic():
+            self._update_snapshot(user_id, sum(amount for amount, _ in amounts), require_funds)
+            return self.bulk_create(
+                [BalanceLedger(user_id=user_id, amount=amount, kind=kind, order=order) for amount, order in amounts]
+            )
+
+    @staticmethod
+    def _update_snapshot(user_id, amount, require_funds):
+        snapshot = Balance.objects.filter(user_id=user_id)
+        if require_funds and amount < 0:
+            snapshot = snapshot.filter(cents__gte=-amount)
+        if not snapshot.update(cents=F('cents') + amount):
+            if require_funds and amount < 0:
+                raise InsufficientBalance(user_id, -amount)
+            # Lygiagretus pirmas įrašas galėjo jau sukurti kopiją (user unikalus).
+            _, created = Balance.objects.get_or_create(user_id=user_id, defaults={'cents': amount})
+            if not created:
+                Balance.objects.filter(user_id=user_id).update(cents=F('cents') + amount)
+
+    def reconcile(self, user_ids, fix=True):
+        """
+        Perskaičiuoja nurodytų vartotojų Balance kopijas iš įrašų sumos
+        (viena GROUP BY užklausa visai grupei).
+        Suma skaičiuojama jau užrakinus kopijas, todėl lygiagretus record()
+        arba laukia, arba jo įrašas jau įskaičiuotas.
+        :return: neatitikusių (user_id, buvo, turi būti) sąrašas.
+        """
+        drift = []
+        with transaction.atomic():
+            snapshots = list(Balance.objects.select_for_update().filter(user_id__in=user_ids))
+            totals = dict(
+                self.filter(user_id__in=user_ids).order_by().values('user_id')
+                .annotate(total=Sum('amount')).values_list('user_id', 'total')
+            )
+            stale = []
+            for snapshot in snapshots:
+                expected = totals.pop(snapshot.user_id, 0)
+                if snapshot.cents != expected:
+                    drift.append((snapshot.user_id, snapshot.cents, expected))
+                    snapshot.cents = expected
+                    stale.append(snapshot)
+            # Įrašai be Balance kopijos.
+            missing = [Balance(user_id=user_id, cents=total) for user_id, total in totals.items()]
+            drift.extend((b.user_id, None, b.cents) for b in missing)
+            if fix:
+                Balance.objects.bulk_update(stale, ['cents'])
+                Balance.objects.bulk_create(missing)
+        return drift
+
+
+class BalanceLedger(models.Model):
+    """
+    Nekeičiamas balanso operacijų žurnalas (tik pridedami įrašai).
+    Sumos saugomos sveikais centais, todėl nėra apvalinimo paklaidų.
+    """
+    TOPUP = 't'
+    CHARGE = 'c'
+    REFUND = 'r'
+
+    KINDS = (
+        (TOPUP, 'Papildymas'),
+        (CHARGE, 'Uzsakymo mokestis'),
+        (REFUND, 'Grazinimas'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger')
+    kind = models.CharField(max_length=1, choices=KINDS)
+    amount = models.BigIntegerField("Suma_centais")
+    order = models.ForeignKey("Order", on_delete=models.SET_NULL, null=True, blank=True)
+    created = models.DateTimeField("Sukurta", auto_now_add=True)
+
+    objects = BalanceLedgerManager()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'amount'], name='ledger_user_amount_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.get_kind_display()} {self.amount}"
+
+
 class Hotel(models.Model):
 
     """
@@ -43,6 +183,8 @@ class Hotel(models.Model):
     Prie žmonių kieko pridėta apribojimas dėl esamo filtro (ieškoti pagal max žmonių kiekį)
     Max žmonių kiekis - 4.
     Sutvarkyta kainos ir žmonių kieko validacija (negali būti neigiamas)
+    Prieinamumas (availability) - kambarių kiekis vienai nakčiai. Užimtumas
+    skaičiuojamas kiekvienai nakčiai atskirai (žr. HotelNight).
     """
 
     TYPES = (
@@ -83,6 +225,8 @@ class Hotel(models.Model):
     price = models.FloatField("Viesbucio_kaina", null=True)
     quantity = models.IntegerField("Zmoniu_kiekis", default=1, validators=[MaxValueValidator(4)])
     availability = models.IntegerField("Kiekis")
+    # Viešbučio id išorinėje sistemoje (tinklo importas, žr. import_hotels).
+    external_id = models.CharField("Isorinis_id", max_length=64, unique=True, null=True, blank=True)
 
     class Meta:
         ordering = ['id']
@@ -99,6 +243,41 @@ class Hotel(models.Model):
         super().clean()
 
 
+class OrderQuerySet(models.QuerySet):
+
+    def filtered(self, status=None, hotel=None, date_from=None, date_to=None):
+        """
+        Užsakymų filtrai (statusas, viešbutis, įsiregistravimo datų intervalas).
+        Tušti parametrai ignoruojami.
+        """
+        orders_ = self
+        if status:
+            orders_ = orders_.filter(status=status)
+        if hotel:
+            orders_ = orders_.filter(hotel=hotel)
+        if date_from:
+            orders_ = orders_.filter(r_date__gte=date_from)
+        if date_to:
+            orders_ = orders_.filter(r_date__lte=date_to)
+        return orders_
+
+    def bulk_create_with_details(self, orders, batch_size=1000):
+        """
+        Sukuria daug užsakymų kartu su jų admin detalėmis dviem bulk_create
+        (save() ir signalai nekviečiami).
+        """
+        orders = list(orders)
+        for order in orders:
+            order.set_booked_price()
+        pending = [order for order in orders if order.admin_details_id is None]
+        details = AdminDetails.objects.bulk_create(
+            [AdminDetails.pending(order.client_id) for order in pending], batch_size=batch_size
+        )
+        for order, admin_details in zip(pending, details):
+            order.admin_details = admin_details
+        return self.bulk_create(orders, batch_size=batch_size)
+
+
 class Order(models.Model):
     """
     Pagrindinė užsakymo lentelė.
@@ -130,15 +309,47 @@ class Order(models.Model):
 
     admin_details = models.OneToOneField("AdminDetails", on_delete=models.CASCADE, null=True)
 
+    # Ar užsakymas laiko nakčių kambarius (HotelNight.sold). Importuoti be
+    # rezervavimo (import_orders --no-reserve) - ne, jų ištrynimas nakčių neatlaisvina.
+    reserved = models.BooleanField("Rezervuota", default=True)
+
+    # Užsakymo metu galiojusi nakties kaina centais. Suvestinės pajamos
+    # skaičiuojamos iš jos, todėl vėlesnis hotel.price keitimas jų nekeičia.
+    price_cents = models.BigIntegerField("Nakties_kaina_centais", null=True, blank=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='order_status_id_idx'),
+            models.Index(fields=['hotel', 'id'], name='order_hotel_id_idx'),
+            models.Index(fields=['r_date', 'id'], name='order_r_date_id_idx'),
+            # Viešbučio kalendoriaus intervalų užklausa (occupancy.build_calendar).
+            models.Index(fields=['hotel', 'r_date', 'i_date'], name='order_hotel_stay_idx'),
+        ]
+
+    # Admin detalės sukuriamos prieš užsakymą, todėl naujas užsakymas -
+    # du INSERT'ai (detalės + užsakymas) be papildomo UPDATE.
     def save(self, *args, **kwargs):
+        self.set_booked_price()
+        if self.admin_details_id is None:
+            self.admin_details = AdminDetails.pending(self.client_id)
+            self.admin_details.save()
         super().save(*args, **kwargs)
-        if not self.admin_details:
-            self.admin_details = AdminDetails.objects.create(client=self.client, room_id=0, aukstas=0,
-                                                             ramybes_valandos="Laukiama patvirtinimo")
-            self.save()
 
+    def set_booked_price(self):
+        """
+        Užfiksuoja viešbučio nakties kainą (jeigu dar nenustatyta).
+        """
+        if self.price_cents is None and self.hotel_id is not None:
+            self.price_cents = to_cents(self.hotel.price or 0)
+
+    # Klientas ir viešbutis gali būti ištrinti (SET_NULL). Sąrašuose naudoti
+    # select_related('client', 'hotel'), kitaip kiekvienam užsakymui - dvi užklausos.
     def __str__(self):
-        return f"{self.client.name} {self.hotel.name}"
+        client = self.client.name if self.client_id else '-'
+        hotel = self.hotel.name if self.hotel_id else '-'
+        return f"{client} {hotel}"
 
 
 class AdminDetails(models.Model):
@@ -152,6 +363,13 @@ class AdminDetails(models.Model):
     aukstas = models.IntegerField("Aukstas")
     ramybes_valandos = models.CharField("Ramybes_valandos", max_length=20)
 
+    @classmethod
+    def pending(cls, client_id):
+        """
+        Naujo užsakymo admin detalės (dar nepatvirtinta).
+        """
+        return cls(client_id=client_id, room_id=0, aukstas=0, ramybes_valandos="Laukiama patvirtinimo")
+
     # Aukšto ir kambario numerio neigiamo skaičiaus sutvarkymas
     def clean(self):
         if self.room_id < 0:
@@ -161,4 +379,269 @@ class AdminDetails(models.Model):
         super().clean()
 
     def __str__(self):
-        return f"{self.client.name} {self.room_id} {self.aukstas}"
+        client = self.client.name if self.client_id else '-'
+        return f"{client} {self.room_id} {self.aukstas}"
+
+
+class BookingError(Exception):
+    """
+    Bendra rezervacijos klaida - užsakymas nesukuriamas, pakeitimai atšaukiami.
+    """
+
+
+class NoAvailability(BookingError):
+    """
+    Keliama, kai bent vienai pasirinkto laikotarpio nakčiai neliko laisvų kambarių.
+    """
+
+
+class InsufficientBalance(BookingError):
+    """
+    Keliama, kai vartotojo balanco nepakanka užsakymui apmokėti.
+    """
+
+
+class HotelNightManager(models.Manager):
+
+    @staticmethod
+    def nights(r_date, i_date):
+        """
+        Grąžina visas nakvynės datas nuo r_date (imtinai) iki i_date (neimtinai).
+        """
+        return [r_date + timedelta(days=i) for i in range((i_date - r_date).days)]
+
+    def for_range(self, hotel, r_date, i_date):
+        return self.filter(hotel=hotel, date__gte=r_date, date__lt=i_date)
+
+    def ensure(self, hotel, r_date, i_date):
+        """
+        Sukuria trūkstamas nakčių eilutes. Esamos eilutės nepaliečiamos.
+        """
+        self.bulk_create(
+            [HotelNight(hotel=hotel, date=night, capacity=hotel.availability)
+             for night in self.nights(r_date, i_date)],
+            ignore_conflicts=True
+        )
+
+    def is_available(self, hotel, r_date, i_date, rooms=1):
+        """
+        Ar laikotarpyje kiekvienai nakčiai liko bent `rooms` laisvų kambarių.
+        Naktis be eilutės laikoma laisva (talpa = hotel.availability).
+        Atsakoma viena indeksuota užklausa per (hotel, date) intervalą.
+        """
+        if hotel.availability < rooms:
+            return False
+        return not self.for_range(hotel, r_date, i_date).filter(
+            sold__gt=F('capacity') - rooms
+        ).exists()
+
+    async def ais_available(self, hotel, r_date, i_date, rooms=1):
+        if hotel.availability < rooms:
+            return False
+        return not await self.for_range(hotel, r_date, i_date).filter(
+            sold__gt=F('capacity') - rooms
+        ).aexists()
+
+    def reserve(self, hotel, r_date, i_date, rooms=1):
+        """
+        Atomiškai parduoda `rooms` kambarių kiekvienai laikotarpio nakčiai.
+        Jeigu bent viena naktis pilna - niekas nepakeičiama ir keliama NoAvailability.
+        """
+        nights = self.nights(r_date, i_date)
+        with transaction.atomic():
+            self.ensure(hotel, r_date, i_date)
+            updated = self.for_range(hotel, r_date, i_date).filter(
+                sold__lte=F('capacity') - rooms
+            ).update(sold=F('sold') + rooms)
+            if updated != len(nights):
+                raise NoAvailability(hotel.pk, r_date, i_date)
+
+    def reserve_many(self, lines):
+        """
+        Kaip reserve, tik daugeliui (hotel, r_date, i_date) eilučių iš karto:
+        trūkstamos naktys sukuriamos vienu bulk_create, visos paveiktos naktys
+        nuskaitomos (užrakinamos) viena užklausa ir atnaujinamos bulk_update.
+        Užklausų kiekis nepriklauso nuo eilučių kiekio.
+        """
+        needed = Counter()
+        hotels_ = {}
+        for hotel, r_date, i_date in lines:
+            hotels_[hotel.pk] = hotel
+            for night in self.nights(r_date, i_date):
+                needed[(hotel.pk, night)] += 1
+        if not needed:
+            return
+
+        dates = [night for _, night in needed]
+        with transaction.atomic():
+            self.bulk_create(
+                [HotelNight(hotel_id=hotel_id, date=night, capacity=hotels_[hotel_id].availability)
+                 for hotel_id, night in needed],
+                ignore_conflicts=True, batch_size=500
+            )
+            rows = self.select_for_update().filter(
+                hotel_id__in=hotels_, date__gte=min(dates), date__lte=max(dates)
+            )
+            changed = []
+            for row in rows:
+                rooms = needed.get((row.hotel_id, row.date))
+                if not rooms:
+                    continue
+                if row.sold + rooms > row.capacity:
+                    raise NoAvailability(row.hotel_id, row.date)
+                row.sold += rooms
+                changed.append(row)
+            self.bulk_update(changed, ['sold'], batch_size=500)
+
+    def release(self, hotel, r_date, i_date, rooms=1):
+        """
+        Grąžina kambarius atgal į laisvų sąrašą (pvz. ištrynus užsakymą).
+        """
+        self.for_range(hotel, r_date, i_date).filter(sold__gte=rooms).update(sold=F('sold') - rooms)
+
+
+class HotelNight(models.Model):
+    """
+    Viešbučio užimtumas konkrečiai nakčiai.
+    Viena eilutė vienam viešbučiui ir vienai nakčiai: talpa (capacity) ir
+    parduotų kambarių kiekis (sold). Eilutės kuriamos tik toms naktims,
+    kurioms buvo bent viena rezervacija.
+    """
+    hotel = models.ForeignKey("Hotel", on_delete=models.CASCADE, related_name='nights')
+    date = models.DateField("Nakties_data")
+    capacity = models.PositiveIntegerField("Talpa")
+    sold = models.PositiveIntegerField("Parduota", default=0)
+
+    objects = HotelNightManager()
+
+    class Meta:
+        ordering = ['hotel', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'date'], name='unique_hotel_night'),
+        ]
+
+    @property
+    def free(self):
+        return max(self.capacity - self.sold, 0)
+
+    def __str__(self):
+        return f"{self.hotel_id} {self.date} {self.sold}/{self.capacity}"
+
+
+class DailyHotelStatsQuerySet(models.QuerySet):
+
+    def with_metrics(self):
+        """
+        Prideda užimtumą (0..1), ADR ir RevPAR centais kiekvienai dienai.
+        Dalyba iš nulio grąžina NULL.
+        """
+        return self.annotate(
+            occupancy=ExpressionWrapper(
+                Cast('rooms_sold', models.FloatField()) / NullIf('capacity', 0), output_field=models.FloatField()
+            ),
+            adr_cents=ExpressionWrapper(
+                Cast('revenue_cents', models.FloatField()) / NullIf('rooms_sold', 0), output_field=models.FloatField()
+            ),
+            revpar_cents=ExpressionWrapper(
+                Cast('revenue_cents', models.FloatField()) / NullIf('capacity', 0), output_field=models.FloatField()
+            ),
+        )
+
+    def period(self, hotel=None, date_from=None, date_to=None):
+        stats = self
+        if hotel:
+            stats = stats.filter(hotel=hotel)
+        if date_from:
+            stats = stats.filter(date__gte=date_from)
+        if date_to:
+            stats = stats.filter(date__lte=date_to)
+        return stats
+
+
+class DailyHotelStatsManager(models.Manager.from_queryset(DailyHotelStatsQuerySet)):
+
+    def ensure(self, hotel, nights):
+        self.bulk_create(
+            [DailyHotelStats(hotel_id=hotel.pk, date=night, capacity=hotel.availability) for night in nights],
+            ignore_conflicts=True, batch_size=500
+        )
+
+    def record_stay(self, hotel, r_date, i_date, rooms=1, price_cents=0):
+        """
+        Prideda (rooms > 0) arba atima (rooms < 0) vieno užsakymo naktis ir
+        pajamas (price_cents - užsakyta nakties kaina). Dvi užklausos, kiek nakčių bebūtų.
+        """
+        nights = HotelNight.objects.nights(r_date, i_date)
+        if not nights:
+            return
+        with transaction.atomic():
+            self.ensure(hotel, nights)
+            self.filter(hotel=hotel, date__gte=r_date, date__lt=i_date).update(
+                rooms_sold=F('rooms_sold') + rooms,
+                revenue_cents=F('revenue_cents') + rooms * price_cents,
+            )
+
+    def record_stays(self, lines):
+        """
+        Kaip record_stay, daugeliui (hotel, r_date, i_date, rooms, price_cents) eilučių:
+        trūkstamos dienos sukuriamos vienu bulk_create, paveiktos eilutės
+        nuskaitomos viena užklausa ir atnaujinamos bulk_update.
+        """
+        delta = {}
+        hotels_ = {}
+        for hotel, r_date, i_date, rooms, price in lines:
+            if r_date is None or i_date is None:
+                continue
+            hotels_[hotel.pk] = hotel
+            for night in HotelNight.objects.nights(r_date, i_date):
+                sold, revenue = delta.get((hotel.pk, night), (0, 0))
+                delta[(hotel.pk, night)] = (sold + rooms, revenue + rooms * (price or 0))
+        if not delta:
+            return
+
+        dates = [night for _, night in delta]
+        with transaction.atomic():
+            self.bulk_create(
+                [DailyHotelStats(hotel_id=hotel_id, date=night, capacity=hotels_[hotel_id].availability)
+                 for hotel_id, night in delta],
+                ignore_conflicts=True, batch_size=500
+            )
+            rows = self.select_for_update().filter(
+                hotel_id__in=hotels_, date__gte=min(dates), date__lte=max(dates)
+            )
+            changed = []
+            for row in rows:
+                if (row.hotel_id, row.date) in delta:
+                    sold, revenue = delta[(row.hotel_id, row.date)]
+                    row.rooms_sold += sold
+                    row.revenue_cents += revenue
+                    changed.append(row)
+            self.bulk_update(changed, ['rooms_sold', 'revenue_cents'], batch_size=500)
+
+
+class DailyHotelStats(models.Model):
+    """
+    Viešbučio dienos suvestinė ataskaitoms: talpa, parduoti kambariai ir
+    pajamos centais. Atnaujinama kartu su užsakymais (signalai ir bulk
+    keliai), o `rebuild_daily_stats` perskaičiuoja ją iš užsakymų.
+    Ataskaitos ir eksportas skaito tik šią lentelę.
+    """
+    hotel = models.ForeignKey("Hotel", on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField("Data")
+    capacity = models.PositiveIntegerField("Talpa")
+    rooms_sold = models.IntegerField("Parduota", default=0)
+    revenue_cents = models.BigIntegerField("Pajamos_centais", default=0)
+
+    objects = DailyHotelStatsManager()
+
+    class Meta:
+        ordering = ['hotel', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'date'], name='unique_hotel_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'hotel'], name='daily_stats_date_hotel_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hotel_id} {self.date} {self.rooms_sold}/{self.capacity}"
@@ -0,0 +1,127 @@
+import re
+import sys
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Vienos užklausos užklausų formų skaitiklis (žr. timing._current).
+_current = ContextVar('viesbuciai_query_shapes', default=None)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+IN_RE = re.compile(r"\bIN \((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+SPACE_RE = re.compile(r"\s+")
+
+
+class NPlusOneError(Exception):
+    """
+    Užklausos metu ta pati SELECT forma įvykdyta daugiau kartų nei leidžiama.
+    """
+
+
+@lru_cache(maxsize=2048)
+def query_shape(sql):
+    """
+    SQL be konkrečių reikšmių: eilutės, skaičiai ir parametrai -> ?,
+    IN (?, ?, ...) -> IN (...). Vienodos formos užklausos cikle - N+1 požymis.
+    """
+    shape = STRING_RE.sub('?', sql).replace('%s', '?')
+    shape = NUMBER_RE.sub('?', shape)
+    shape = IN_RE.sub('IN (...)', shape)
+    return SPACE_RE.sub(' ', shape).strip()
+
+
+def template_position():
+    """
+    Vidiniausias šiuo metu atvaizduojamas šablono mazgas: (šablonas, eilutė).
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return origin.name, token.lineno
+        frame = frame.f_back
+    return None
+
+
+# Matavimo moduliai stekuose nerodomi.
+INSTRUMENTATION = ('middleware.py', 'timing.py', 'nplusone.py')
+
+
+def project_stack(limit=8):
+    """
+    Paskutiniai projekto (ne Django, ne bibliotekų ir ne matavimo) kvietimai.
+    """
+    base = str(settings.BASE_DIR)
+    frames = [
+        f"{frame.filename}:{frame.lineno} {frame.name}"
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(INSTRUMENTATION)
+    ]
+    return frames[-limit:]
+
+
+class QueryShapes:
+    """
+    Užklausų formų skaičiavimas vienai HTTP užklausai. Viršijus slenkstį,
+    įsimenama forma, šablono vieta ir kvietimų stekas (vieną kartą formai).
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.view = None
+        self.counts = Counter()
+        self.reports = {}
+
+    def record(self, sql):
+        if not sql.lstrip()[:6].upper() == 'SELECT':
+            return
+        shape = query_shape(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == self.threshold + 1:
+            self.reports[shape] = {
+                'shape': shape,
+                'template': template_position(),
+                'stack': project_stack(),
+            }
+
+    def problems(self):
+        return [dict(report, count=self.counts[shape]) for shape, report in self.reports.items()]
+
+
+def start(threshold):
+    install_shape_recorder(connections)
+    shapes = QueryShapes(threshold)
+    return shapes, _current.set(shapes)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def record_shape(execute, sql, params, many, context):
+    shapes = _current.get()
+    if shapes is not None:
+        shapes.record(sql)
+    return execute(sql, params, many, context)
+
+
+def install_shape_recorder(connections_):
+    for connection in connections_.all():
+        if record_shape not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_shape)
+
+
+@receiver(connection_created)
+def add_shape_recorder(sender, connection, **kwargs):
+    if record_shape not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_shape)
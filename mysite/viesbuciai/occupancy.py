@@ -0,0 +1,129 @@
+import calendar
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count
+from .caching import version_timeout
+from .models import Hotel, HotelNight, Order
+from .routers import use_primary
+
+try:
+    import numpy as np
+except ImportError:  # numpy neprivalomas - tada skaičiuojama grynu Python.
+    np = None
+
+CALENDAR_MIN_MONTHS = 3
+CALENDAR_MAX_MONTHS = 12
+CALENDAR_TIMEOUT = 60 * 60
+
+
+def add_months(start, months):
+    """
+    Ta pati mėnesio diena po `months` mėnesių (31 d. -> paskutinė mėnesio diena).
+    """
+    month = start.month - 1 + months
+    year, month = start.year + month // 12, month % 12 + 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def calendar_version_key(hotel_id):
+    return f"viesbuciai:calendar:{hotel_id}:version"
+
+
+def calendar_version(hotel_id):
+    key = calendar_version_key(hotel_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), version_timeout())
+        version = cache.get(key)
+    return version
+
+
+def bump_calendar_version(*hotel_ids):
+    """
+    Pasenina viešbučių kalendorių cache (po užsakymo sukūrimo, pakeitimo ar ištrynimo).
+    """
+    for hotel_id in set(hotel_ids):
+        if hotel_id is None:
+            continue
+        try:
+            cache.incr(calendar_version_key(hotel_id))
+        except ValueError:
+            cache.set(calendar_version_key(hotel_id), time.time_ns(), version_timeout())
+
+
+def occupancy(stays, start, days):
+    """
+    Užimtų kambarių kiekis kiekvienai nakčiai [start, start + days).
+    Skirtumų masyvas: atvykimo dienai +n, išvykimo dienai -n, kaupiamoji suma.
+    Datos už lango ribų priskiriamos kraštams.
+    :param stays: (r_date, i_date, n) trejetai - n užsakymų su tuo pačiu
+    intervalu; i_date - išvykimo diena (ta naktis neužimta).
+    :return: sąrašas iš `days` sveikųjų skaičių.
+    """
+    origin = start.toordinal()
+    if np is not None:
+        stays = np.array(
+            [(r_date.toordinal(), i_date.toordinal(), n) for r_date, i_date, n in stays], dtype=np.int64
+        ).reshape(-1, 3)
+        bounds = (stays[:, :2] - origin).clip(0, days)
+        valid = bounds[:, 0] < bounds[:, 1]
+        bounds, weights = bounds[valid], stays[valid, 2]
+        diff = np.bincount(bounds[:, 0], weights, days + 1) - np.bincount(bounds[:, 1], weights, days + 1)
+        return diff.cumsum()[:days].astype(np.int64).tolist()
+
+    diff = [0] * (days + 1)
+    for r_date, i_date, n in stays:
+        first = min(max(r_date.toordinal() - origin, 0), days)
+        last = min(max(i_date.toordinal() - origin, 0), days)
+        if first < last:
+            diff[first] += n
+            diff[last] -= n
+    counts, occupied = [], 0
+    for change in diff[:days]:
+        occupied += change
+        counts.append(occupied)
+    return counts
+
+
+def build_calendar(hotel, start, months):
+    """
+    Viešbučio kalendorius: kiekvienai nakčiai - užimta ir laisva kambarių.
+    Užsakymai sugrupuojami DB pusėje pagal (r_date, i_date) vienu indekso
+    (hotel, r_date, i_date) perėjimu, todėl į Python ateina tik skirtingi
+    intervalai, o ne kiekvienas užsakymas. Nakčių talpa - HotelNight eilutės,
+    kitaip hotel.availability.
+    """
+    end = add_months(start, months)
+    days = (end - start).days
+    stays = Order.objects.filter(
+        hotel=hotel, r_date__lt=end, i_date__gt=start
+    ).values_list('r_date', 'i_date').annotate(n=Count('id')).order_by()
+    occupied = occupancy(stays, start, days)
+    capacities = dict(HotelNight.objects.for_range(hotel, start, end).values_list('date', 'capacity'))
+
+    nights = []
+    for offset, taken in enumerate(occupied):
+        night = start + timedelta(days=offset)
+        capacity = capacities.get(night, hotel.availability)
+        nights.append({
+            'date': night, 'capacity': capacity, 'occupied': taken, 'remaining': max(capacity - taken, 0),
+        })
+    return {'hotel': hotel.pk, 'start': start, 'end': end, 'nights': nights}
+
+
+def hotel_calendar(hotel_id, start, months=CALENDAR_MIN_MONTHS):
+    """
+    Kalendorius iš cache (raktas - viešbučio kalendoriaus versija, pradžia, mėnesiai).
+    :return: žodynas arba None, jeigu viešbučio nėra.
+    """
+    key = f"viesbuciai:calendar:{hotel_id}:{calendar_version(hotel_id)}:{start}:{months}"
+    value = cache.get(key)
+    if value is None:
+        with use_primary():
+            hotel = Hotel.objects.filter(pk=hotel_id).first()
+            if hotel is None:
+                return None
+            value = build_calendar(hotel, start, months)
+        cache.set(key, value, CALENDAR_TIMEOUT)
+    return value
@@ -0,0 +1,112 @@
+import base64
+import binascii
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Iššifruoja kursorių. Netinkamas kursorius - None (rodomas pirmas puslapis).
+    """
+    if not token:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """
+    Kursoriaus (keyset) puslapis. Nėra bendro puslapių kiekio - tik nuorodos
+    į ankstesnį ir kitą puslapį, todėl nereikia COUNT(*) ir OFFSET užklausų.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _keyset_plan(queryset, per_page, after, before, page, key):
+    """
+    Puslapio užklausa ir funkcija, iš gautų eilučių sukurianti KeysetPage.
+    Bendra sinchroninei ir async versijai.
+    """
+    field = key.lstrip('-')
+    descending = key.startswith('-')
+    forward = 'lt' if descending else 'gt'
+    backward = 'gt' if descending else 'lt'
+    reverse_key = field if descending else f'-{field}'
+
+    after, before = decode_cursor(after), decode_cursor(before)
+
+    if before is not None:
+        query = queryset.filter(**{f'{field}__{backward}': before}).order_by(reverse_key)[:per_page + 1]
+        reverse, has_previous, has_next = True, None, True
+    elif after is not None:
+        query = queryset.filter(**{f'{field}__{forward}': after}).order_by(key)[:per_page + 1]
+        reverse, has_previous, has_next = False, True, None
+    else:
+        try:
+            number = max(int(page), 1)
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * per_page
+        query = queryset.order_by(key)[offset:offset + per_page + 1]
+        reverse, has_previous, has_next = False, number > 1, None
+
+    def finish(rows):
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if reverse:
+            rows = rows[::-1]
+        if not rows:
+            return KeysetPage([])
+        more_next = has_more if has_next is None else has_next
+        more_previous = has_more if has_previous is None else has_previous
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(getattr(rows[-1], field)) if more_next else None,
+            previous_cursor=encode_cursor(getattr(rows[0], field)) if more_previous else None,
+        )
+
+    return query, finish
+
+
+def keyset_page(queryset, per_page, after=None, before=None, page=None, key='id'):
+    """
+    Vienas puslapis iš `queryset`, rikiuojant pagal unikalų `key` lauką
+    ('-id' - mažėjančia tvarka). Kiekvienas puslapis - viena indeksuota
+    intervalo užklausa nepriklausomai nuo gylio.
+    :param after: kursorius - rodyti įrašus po juo.
+    :param before: kursorius - rodyti įrašus prieš jį.
+    :param page: senas ?page= numeris (OFFSET), kai nėra kursoriaus.
+    """
+    query, finish = _keyset_plan(queryset, per_page, after, before, page, key)
+    return finish(list(query))
+
+
+async def akeyset_page(queryset, per_page, after=None, before=None, page=None, key='id'):
+    """
+    keyset_page async versija (Django async ORM).
+    """
+    query, finish = _keyset_plan(queryset, per_page, after, before, page, key)
+    return finish([row async for row in query])
@@ -0,0 +1,179 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Coalesce
+from .models import DailyHotelStats, Hotel, HotelNight, Order
+from .occupancy import occupancy
+
+
+def order_stay(order):
+    """
+    Užsakymo (hotel_id, r_date, i_date, price_cents) iš jau įkeltų laukų.
+    Atidėtiems (only/defer) laukams grąžinama None, kad nebūtų papildomų užklausų.
+    """
+    values = order.__dict__
+    if all(field in values for field in ('hotel_id', 'r_date', 'i_date', 'price_cents')):
+        return values['hotel_id'], values['r_date'], values['i_date'], values['price_cents']
+    return None
+
+
+def is_stay(stay):
+    return stay is not None and None not in stay[:3] and stay[1] < stay[2]
+
+
+def record_order_change(order, old, new):
+    """
+    Perkelia užsakymo naktis suvestinėje: senas intervalas atimamas, naujas
+    pridedamas. Sukūrimui old=None, atšaukimui new=None.
+    """
+    if old == new:
+        return
+    changes = [(stay, rooms) for stay, rooms in ((old, -1), (new, 1)) if is_stay(stay)]
+    hotels_ = {}
+    if Order.hotel.is_cached(order) and order.hotel is not None:
+        hotels_[order.hotel.pk] = order.hotel
+    missing = {stay[0] for stay, _ in changes} - hotels_.keys()
+    if missing:
+        hotels_.update(Hotel.objects.in_bulk(missing))
+    for (hotel_id, r_date, i_date, price_cents), rooms in changes:
+        if hotel_id in hotels_:
+            DailyHotelStats.objects.record_stay(hotels_[hotel_id], r_date, i_date, rooms, price_cents or 0)
+
+
+def rebuild_hotel_stats(hotel, batch_size=1000):
+    """
+    Perskaičiuoja vieno viešbučio suvestinę iš užsakymų. Užsakymai
+    sugrupuojami DB pusėje pagal (r_date, i_date) ir sudedami skirtumų
+    masyvu (occupancy), todėl atmintis priklauso nuo dienų, o ne nuo
+    užsakymų kiekio. Pajamos - užsakymuose išsaugotos nakties kainos (price_cents).
+    Esamos suvestinės eilutės užrakinamos prieš skaitant užsakymus, todėl
+    lygiagretus record_stay arba jau įskaičiuotas, arba laukia ir pridedamas
+    prie perskaičiuotos eilutės. Dienos be užsakymų lieka su nuliais.
+    :return: įrašytų dienų kiekis.
+    """
+    with transaction.atomic():
+        current = {row.date: row for row in DailyHotelStats.objects.select_for_update().filter(hotel=hotel)}
+        stays = Order.objects.filter(hotel=hotel, r_date__isnull=False, i_date__isnull=False)
+        bounds = stays.aggregate(start=Min('r_date'), end=Max('i_date'))
+        rebuilt = {}
+        if bounds['start'] and bounds['end'] > bounds['start']:
+            start, days = bounds['start'], (bounds['end'] - bounds['start']).days
+            grouped = list(
+                stays.values_list('r_date', 'i_date')
+                .annotate(n=Count('id'), cents=Coalesce(Sum('price_cents'), 0)).order_by()
+                .iterator(chunk_size=batch_size)
+            )
+            sold = occupancy(((r_date, i_date, n) for r_date, i_date, n, _ in grouped), start, days)
+            revenue = occupancy(((r_date, i_date, cents) for r_date, i_date, _, cents in grouped), start, days)
+            capacities = dict(
+                HotelNight.objects.for_range(hotel, start, bounds['end']).values_list('date', 'capacity')
+            )
+            for offset, rooms in enumerate(sold):
+                if rooms:
+                    night = start + timedelta(days=offset)
+                    rebuilt[night] = (capacities.get(night, hotel.availability), rooms, revenue[offset])
+
+        changed, new = [], []
+        for night, row in current.items():
+            if night not in rebuilt and (row.rooms_sold or row.revenue_cents):
+                row.rooms_sold = row.revenue_cents = 0
+                changed.append(row)
+        for night, (capacity, rooms, cents) in rebuilt.items():
+            row = current.get(night)
+            if row is None:
+                new.append(DailyHotelStats(
+                    hotel=hotel, date=night, capacity=capacity, rooms_sold=rooms, revenue_cents=cents,
+                ))
+            elif (row.capacity, row.rooms_sold, row.revenue_cents) != (capacity, rooms, cents):
+                row.capacity, row.rooms_sold, row.revenue_cents = capacity, rooms, cents
+                changed.append(row)
+        DailyHotelStats.objects.bulk_update(changed, ['capacity', 'rooms_sold', 'revenue_cents'], batch_size=batch_size)
+        DailyHotelStats.objects.bulk_create(new, batch_size=batch_size)
+    return len(rebuilt)
+
+
+def rebuild_hotel_nights(hotel, batch_size=1000):
+    """
+    Perskaičiuoja viešbučio nakčių užimtumą (HotelNight.sold) iš rezervuotų
+    užsakymų (Order.reserved) - pvz. užsakymams, sukurtiems apeinant
+    HotelNight.objects.reserve. Kaip ir rebuild_hotel_stats, nakčių eilutės
+    užrakinamos prieš skaitant užsakymus.
+    :return: pakeistų nakčių kiekis.
+    """
+    with transaction.atomic():
+        current = {night.date: night for night in HotelNight.objects.select_for_update().filter(hotel=hotel)}
+        stays = Order.objects.filter(hotel=hotel, reserved=True, r_date__isnull=False, i_date__isnull=False)
+        bounds = stays.aggregate(start=Min('r_date'), end=Max('i_date'))
+        sold = {}
+        if bounds['start'] and bounds['end'] > bounds['start']:
+            start, days = bounds['start'], (bounds['end'] - bounds['start']).days
+            grouped = stays.values_list('r_date', 'i_date').annotate(n=Count('id')).order_by()
+            for offset, rooms in enumerate(occupancy(grouped.iterator(chunk_size=batch_size), start, days)):
+                if rooms:
+                    sold[start + timedelta(days=offset)] = rooms
+
+        changed = []
+        for night, row in current.items():
+            rooms = sold.pop(night, 0)
+            if row.sold != rooms:
+                row.sold = rooms
+                changed.append(row)
+        new = [HotelNight(hotel=hotel, date=night, capacity=hotel.availability, sold=rooms) for night, rooms in sold.items()]
+        HotelNight.objects.bulk_update(changed, ['sold'], batch_size=batch_size)
+        HotelNight.objects.bulk_create(new, batch_size=batch_size)
+    return len(changed) + len(new)
+
+
+def ratio(numerator, denominator):
+    return numerator / denominator if denominator else None
+
+
+def from_cents(cents):
+    return Decimal(round(cents)) / 100 if cents is not None else None
+
+
+def hotel_totals(hotels_, date_from, date_to):
+    """
+    Laikotarpio suvestinė kiekvienam viešbučiui (viena GROUP BY užklausa
+    suvestinės lentelėje). Dienos be eilutės laikomos tuščiomis su talpa
+    hotel.availability.
+    :return: žodynų sąrašas su occupancy, revenue, adr, revpar.
+    """
+    days = (date_to - date_from).days + 1
+    sums = {
+        row['hotel_id']: row for row in DailyHotelStats.objects.period(date_from=date_from, date_to=date_to)
+        .filter(hotel__in=[hotel.pk for hotel in hotels_]).order_by().values('hotel_id')
+        .annotate(capacity=Sum('capacity'), rooms_sold=Sum('rooms_sold'),
+                  revenue_cents=Sum('revenue_cents'), rows=Count('id'))
+    }
+    totals = []
+    for hotel in hotels_:
+        row = sums.get(hotel.pk, {'capacity': 0, 'rooms_sold': 0, 'revenue_cents': 0, 'rows': 0})
+        room_nights = row['capacity'] + hotel.availability * (days - row['rows'])
+        totals.append({
+            'hotel': hotel,
+            'room_nights': room_nights,
+            'rooms_sold': row['rooms_sold'],
+            'occupancy': ratio(row['rooms_sold'], room_nights),
+            'revenue': from_cents(row['revenue_cents']),
+            'adr': from_cents(ratio(row['revenue_cents'], row['rooms_sold'])),
+            'revpar': from_cents(ratio(row['revenue_cents'], room_nights)),
+        })
+    return totals
+
+
+def daily_rows(hotel, date_from, date_to):
+    """
+    Vieno viešbučio dienos eilutės ataskaitai (sumos eurais).
+    """
+    stats = DailyHotelStats.objects.period(hotel=hotel, date_from=date_from, date_to=date_to).with_metrics()
+    return [{
+        'date': row.date,
+        'capacity': row.capacity,
+        'rooms_sold': row.rooms_sold,
+        'occupancy': row.occupancy,
+        'revenue': from_cents(row.revenue_cents),
+        'adr': from_cents(row.adr_cents),
+        'revpar': from_cents(row.revpar_cents),
+    } for row in stats]
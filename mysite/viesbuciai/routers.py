@@ -0,0 +1,129 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+# Sesijos visada skaitomos iš pagrindinės db: atsilikusi replika reikštų atsijungimą.
+PRIMARY_APPS = {'sessions'}
+
+# Vienos HTTP užklausos maršrutizavimo būsena (nustato ReplicaRoutingMiddleware).
+_current = ContextVar('viesbuciai_db_routing', default=None)
+_primary = ContextVar('viesbuciai_db_primary', default=False)
+
+
+class RoutingState:
+    """
+    Ar užklausa gali skaityti iš replikos: view'sas (request.resolver_match)
+    pažymėtas replica_reads, užklausa GET/HEAD, vartotojas neseniai nieko
+    nerašė (sticky) ir šios užklausos metu dar nebuvo rašymų.
+    Visa užklausa skaito iš tos pačios replikos (alias).
+    """
+
+    def __init__(self, request=None, sticky=False):
+        self.request = request
+        self.sticky = sticky
+        self.wrote = False
+        self.alias = None
+
+    @property
+    def replica(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return (
+            match is not None and self.request.method in ('GET', 'HEAD')
+            and getattr(match.func, 'replica_reads', False)
+        )
+
+    @property
+    def use_replica(self):
+        return self.replica and not self.sticky and not self.wrote
+
+
+def start(request=None, sticky=False):
+    state = RoutingState(request, sticky)
+    return state, _current.set(state)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def use_primary():
+    """
+    Bloke visi skaitymai vykdomi pagrindinėje db. Naudojama kuriant cache
+    įrašus, kad atsilikusios replikos duomenys neliktų cache naujai versijai.
+    """
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+def bound(iterable):
+    """
+    Iteratorius, kurio kiekvienas žingsnis vykdomas su dabartine užklausos
+    būsena. StreamingHttpResponse turinys generuojamas jau grįžus iš
+    ReplicaRoutingMiddleware, kai būsena nebenustatyta ir skaitoma iš pagrindinės db.
+    """
+    # Būsena paimama kviečiant bound(), ne pirmą kartą iteruojant.
+    return _bound(_current.get(), iter(iterable))
+
+
+def _bound(state, iterator):
+    while True:
+        token = _current.set(state)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield item
+
+
+def replica_reads(view):
+    """
+    Pažymi view'są, kurio GET/HEAD užklausų skaitymai gali eiti į repliką.
+    """
+    view.replica_reads = True
+    return view
+
+
+class ReplicaRouter:
+    """
+    Rašymai ir skaitymai transakcijos viduje - pagrindinė db ('default').
+    replica_reads view'sų skaitymai - atsitiktinė DATABASE_REPLICAS replika.
+    """
+
+    def __init__(self):
+        self.replicas = list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if (
+            not self.replicas or state is None or not state.use_replica or _primary.get()
+            or model._meta.app_label in PRIMARY_APPS or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+        if state.alias is None:
+            state.alias = random.choice(self.replicas)
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,126 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from .models import Hotel
+
+FTS_TABLE = 'viesbuciai_hotel_fts'
+
+# Pilno teksto indeksas (SQLite FTS5) viešbučio pavadinimui, aprašymui ir adresui.
+# Indeksas nesaugo teksto (content=viesbuciai_hotel), sinchronizuojamas trigeriais.
+FTS_INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, address,
+        content='viesbuciai_hotel', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON viesbuciai_hotel BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON viesbuciai_hotel BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON viesbuciai_hotel BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, address)
+        VALUES ('delete', old.id, old.name, old.description, old.address);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, address)
+        VALUES (new.id, new.name, new.description, new.address);
+    END""",
+]
+
+FTS_DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# bm25 svoriai: pavadinimas, aprašymas, adresas.
+FTS_WEIGHTS = (10.0, 1.0, 3.0)
+
+
+def install_fts(conn=connection):
+    """
+    Sukuria (jei nėra) FTS5 lentelę bei trigerius ir perindeksuoja viešbučius.
+    Kitoms duomenų bazėms nieko nedaro.
+    """
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        for sql in FTS_INSTALL_SQL:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def drop_fts(conn=connection):
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for sql in FTS_DROP_SQL:
+            cursor.execute(sql)
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text or '')
+
+
+def search_hotels(text, stars=None, quantity=None, limit=100):
+    """
+    Pilno teksto paieška, rezultatai surikiuoti pagal atitikimą (bm25).
+    Kiekvienas žodis ieškomas kaip priešdėlis, visi žodžiai privalomi.
+    Papildomai taikomi žvaigždučių ir žmonių kiekio filtrai.
+    :return: Hotel sąrašas.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+
+    if connection.vendor != 'sqlite':
+        hotels_ = Hotel.objects.all()
+        for term in terms:
+            hotels_ = hotels_.filter(Q(name__icontains=term) | Q(description__icontains=term) |
+                                     Q(address__icontains=term))
+        if stars:
+            hotels_ = hotels_.filter(stars=stars)
+        if quantity:
+            hotels_ = hotels_.filter(quantity=quantity)
+        return list(hotels_[:limit])
+
+    match = ' '.join('"{}"*'.format(term) for term in terms)
+    where = [f"{FTS_TABLE} MATCH %s"]
+    params = [match]
+    if stars:
+        where.append("h.stars = %s")
+        params.append(stars)
+    if quantity:
+        where.append("h.quantity = %s")
+        params.append(quantity)
+    params.append(limit)
+
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    sql = (
+        f"SELECT h.* FROM {FTS_TABLE} JOIN viesbuciai_hotel h ON h.id = {FTS_TABLE}.rowid "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s"
+    )
+    return list(Hotel.objects.raw(sql, params))
+
+
+def filter_hotels(name=None, q=None, stars=None, quantity=None):
+    """
+    Viešbučių filtras (hotel_filter ir API): ?q= - pilno teksto paieška,
+    ?name= - tikslus pavadinimas, papildomai žvaigždutės ir žmonių kiekis.
+    """
+    if q:
+        return search_hotels(q, stars=stars, quantity=quantity)
+
+    hotels_ = Hotel.objects.all()
+    if name:
+        hotels_ = hotels_.filter(name__iexact=name)
+    if stars:
+        hotels_ = hotels_.filter(stars=stars)
+    if quantity:
+        hotels_ = hotels_.filter(quantity=quantity)
+    return hotels_
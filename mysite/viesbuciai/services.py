@@ -0,0 +1,197 @@
+from collections import defaultdict
+from datetime import date
+from django.db import transaction
+from .catalog import bump_catalog_version
+from .middleware import invalidate_profile_context
+from .models import BalanceLedger, DailyHotelStats, Hotel, HotelNight, Order, BookingError, to_cents
+from .occupancy import bump_calendar_version
+from .reports import is_stay, order_stay
+
+
+def book_hotel(user, hotel, r_date, i_date):
+    """
+    Viešbučio rezervacija vienoje transakcijoje.
+    Nakčių užimtumas didinamas HotelNight.objects.reserve, mokestis įrašomas į
+    BalanceLedger (Balance kopija nurašoma sąlyginiu F() update'u, tik jeigu
+    likučio pakanka). Bet kuriai daliai nepavykus - atšaukiama viskas ir
+    keliama BookingError.
+    :param user: užsakantis vartotojas.
+    :param hotel: Hotel objektas (gautas iš anksto, transakcija jo nebeskaito).
+    :return: sukurtas Order.
+    """
+    days = (i_date - r_date).days
+    if days <= 0 or r_date < date.today():
+        raise BookingError(r_date, i_date)
+    # Viešbutis be kainos neužsakomas (jo nėra ir katalogo pasirinkimuose).
+    if hotel.price is None:
+        raise BookingError(hotel.pk)
+
+    cost = days * to_cents(hotel.price)
+    # request.user jau turi profilį (CachedAuthenticationMiddleware).
+    client = user.profile
+
+    # Pirmas sakinys transakcijoje - rašymas, todėl SQLite iškart paima
+    # rašymo užraktą ir lygiagrečios rezervacijos nesusiduria (deadlock).
+    with transaction.atomic():
+        HotelNight.objects.reserve(hotel, r_date, i_date)
+
+        order = Order(client=client, hotel=hotel, r_date=r_date, i_date=i_date)
+        order.save()
+
+        BalanceLedger.objects.record(user, -cost, BalanceLedger.CHARGE, order=order, require_funds=True)
+    return order
+
+
+def save_order(order):
+    """
+    Užsakymo sukūrimas ar pakeitimas ne per book_hotel (admin). Pasikeitus
+    viešbučiui ar datoms, senos naktys atlaisvinamos, naujos rezervuojamos
+    HotelNight.objects.reserve. Balansas nekeičiamas.
+    Bent vienai naujai nakčiai neužtekus vietų - keliama NoAvailability ir
+    niekas neišsaugoma.
+    :param order: Order su (pakeistais) laukais; senas intervalas - order._stay.
+    :return: išsaugotas užsakymas.
+    """
+    created = order.pk is None
+    old = None if created else order._stay
+    with transaction.atomic():
+        # Nežinomas senas intervalas (atidėti laukai) - naktys nekeičiamos.
+        if created or old is not None and old[:3] != (order.hotel_id, order.r_date, order.i_date):
+            if not created and old[0] != order.hotel_id:
+                order.price_cents = None
+            if not created and order.reserved and is_stay(old):
+                HotelNight.objects.release(old[0], old[1], old[2])
+            if is_stay(order_stay(order)):
+                HotelNight.objects.reserve(order.hotel, order.r_date, order.i_date)
+            order.reserved = True
+        order.save()
+    return order
+
+
+def record_created_stays(orders_):
+    """
+    Prideda bulk_create sukurtus užsakymus į dienos suvestinę ir atnaujina
+    įsimintą intervalą (_stay, žr. views.remember_order_stay): post_init metu
+    kaina dar nebuvo nustatyta, todėl ištrinant nebūtų atimtos pajamos.
+    """
+    DailyHotelStats.objects.record_stays(
+        (order.hotel, order.r_date, order.i_date, 1, order.price_cents) for order in orders_
+    )
+    for order in orders_:
+        order._stay = order_stay(order)
+
+
+def create_orders_bulk(orders, reserve=True, batch_size=1000):
+    """
+    Daug užsakymų (importas, kanalų valdiklio sinchronizacija) vienoje transakcijoje.
+    Užsakymai ir admin detalės įrašomi bulk_create, naktys rezervuojamos
+    HotelNight.objects.reserve_many. Balansas nenurašomas.
+    :param orders: neišsaugoti Order objektai su priskirtu hotel.
+    :param reserve: ar mažinti nakčių prieinamumą (įrašoma į Order.reserved).
+    :return: sukurti užsakymai.
+    """
+    orders = list(orders)
+    for order in orders:
+        order.reserved = reserve
+    with transaction.atomic():
+        if reserve:
+            HotelNight.objects.reserve_many((order.hotel, order.r_date, order.i_date) for order in orders)
+        orders = Order.objects.bulk_create_with_details(orders, batch_size=batch_size)
+        # bulk_create nesiunčia signalų - suvestinė ir kalendoriai atnaujinami čia.
+        record_created_stays(orders)
+        transaction.on_commit(lambda: bump_calendar_version(*(order.hotel_id for order in orders)))
+    return orders
+
+
+def book_group(user, lines):
+    """
+    Grupinė rezervacija: daug (hotel_id, r_date, i_date) eilučių viena transakcija.
+    Visos eilutės patikrinamos kartu, balansas nurašomas vieną kartą visai
+    sumai (BalanceLedger įrašas kiekvienam užsakymui), naktys rezervuojamos
+    reserve_many, užsakymai - bulk_create.
+    Užklausų kiekis nepriklauso nuo eilučių kiekio. Bet kuriai eilutei
+    netinkant - nesukuriamas nė vienas užsakymas (BookingError).
+    :return: sukurti užsakymai.
+    """
+    if not lines:
+        raise BookingError()
+
+    hotels_ = Hotel.objects.in_bulk({hotel_id for hotel_id, _, _ in lines})
+    client_id = user.profile.pk
+
+    orders_ = []
+    costs = []
+    for hotel_id, r_date, i_date in lines:
+        hotel = hotels_.get(hotel_id)
+        days = (i_date - r_date).days
+        if hotel is None or hotel.price is None or days <= 0 or r_date < date.today():
+            raise BookingError(hotel_id, r_date, i_date)
+        costs.append(days * to_cents(hotel.price))
+        orders_.append(Order(client_id=client_id, hotel=hotel, r_date=r_date, i_date=i_date))
+
+    with transaction.atomic():
+        HotelNight.objects.reserve_many((order.hotel, order.r_date, order.i_date) for order in orders_)
+        orders_ = Order.objects.bulk_create_with_details(orders_)
+        record_created_stays(orders_)
+        BalanceLedger.objects.record_many(
+            user, [(-cost, order) for cost, order in zip(costs, orders_)], BalanceLedger.CHARGE, require_funds=True
+        )
+        transaction.on_commit(lambda: bump_calendar_version(*hotels_))
+        transaction.on_commit(lambda: invalidate_profile_context(user.pk))
+    return orders_
+
+
+HOTEL_IMPORT_FIELDS = ('name', 'type', 'stars', 'description', 'address', 'price', 'quantity', 'availability')
+
+
+def upsert_hotels(hotels_, batch_size=1000):
+    """
+    Įrašo viešbučius pagal external_id: nauji - bulk_create, pasikeitę -
+    bulk_update, nepasikeitę nepaliečiami. Esamiems keičiami tik faile buvę
+    laukai (kitų nėra su kuo palyginti - jie būtų numatytosios reikšmės).
+    Kartojantis external_id galioja paskutinis. Signalai nesiunčiami, todėl
+    katalogo ir kalendorių versijos bei būsimų nakčių talpa atnaujinami čia.
+    :param hotels_: (Hotel, laukai) poros - patikrinti, neišsaugoti Hotel
+    objektai su external_id ir jų importuoti HOTEL_IMPORT_FIELDS laukai.
+    :return: (sukurta, atnaujinta).
+    """
+    by_external_id = {hotel.external_id: (hotel, fields) for hotel, fields in hotels_}
+    with transaction.atomic():
+        existing = Hotel.objects.filter(external_id__in=by_external_id).only('id', 'external_id', *HOTEL_IMPORT_FIELDS)
+        existing = {hotel.external_id: hotel for hotel in existing}
+
+        new, changed = [], []
+        update_fields = set()
+        capacity = defaultdict(list)
+        for external_id, (hotel, fields) in by_external_id.items():
+            current = existing.get(external_id)
+            if current is None:
+                new.append(hotel)
+                continue
+            fields = [field for field in fields if getattr(hotel, field) != getattr(current, field)]
+            if not fields:
+                continue
+            # Kitų eilučių laukams bulk_update įrašys esamas reikšmes.
+            for field in HOTEL_IMPORT_FIELDS:
+                if field not in fields:
+                    setattr(hotel, field, getattr(current, field))
+            hotel.pk = current.pk
+            if hotel.availability != current.availability:
+                capacity[hotel.availability].append(hotel.pk)
+            update_fields.update(fields)
+            changed.append(hotel)
+
+        Hotel.objects.bulk_create(new, batch_size=batch_size)
+        if changed:
+            Hotel.objects.bulk_update(
+                changed, [field for field in HOTEL_IMPORT_FIELDS if field in update_fields], batch_size=batch_size
+            )
+        today = date.today()
+        for availability, hotel_ids in capacity.items():
+            HotelNight.objects.filter(hotel_id__in=hotel_ids, date__gte=today).update(capacity=availability)
+            DailyHotelStats.objects.filter(hotel_id__in=hotel_ids, date__gte=today).update(capacity=availability)
+
+        if new or changed:
+            transaction.on_commit(bump_catalog_version)
+            transaction.on_commit(lambda: bump_calendar_version(*(hotel.pk for hotel in changed)))
+    return len(new), len(changed)
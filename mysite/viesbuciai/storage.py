@@ -0,0 +1,73 @@
+import gzip
+import os
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Glaudinami tik tekstiniai failai; paveikslėliai ir šriftai (woff2) jau suglaudinti.
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.map', '.svg', '.html', '.txt', '.json', '.xml', '.ico', '.ttf', '.otf', '.eot')
+COMPRESS_MIN_SIZE = 256
+
+
+def compressors():
+    """
+    (plėtinys, funkcija) poros: gzip visada, brotli - jeigu įdiegtas.
+    """
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage (failų vardai su turinio hash ir staticfiles.json),
+    kuris collectstatic metu šalia kiekvieno tekstinio failo įrašo .gz ir .br
+    kopijas. Jas atiduoda middleware.CompressedStaticMiddleware.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name:
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(names):
+                if name.endswith(COMPRESSIBLE):
+                    self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            # Kopija, kuri beveik nesumažėja, nerašoma.
+            if len(compressed) > len(data) * 0.95:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+def static_root_index(root):
+    """
+    STATIC_ROOT failai: {vardas URL'e: {'': kelias, 'gzip': kelias.gz, 'br': kelias.br}}.
+    """
+    index = {}
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            for suffix, encoding in (('.gz', 'gzip'), ('.br', 'br')):
+                if name.endswith(suffix) and os.path.exists(path[:-len(suffix)]):
+                    index.setdefault(name[:-len(suffix)], {})[encoding] = path
+                    break
+            else:
+                index.setdefault(name, {})[''] = path
+    return {name: variants for name, variants in index.items() if '' in variants}
@@ -0,0 +1,55 @@
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from ..catalog import CATALOG_TIMEOUT, catalog_key, catalog_version
+from .. import timing
+
+register = template.Library()
+
+
+class CatalogFragmentNode(template.Node):
+
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        # Katalogo versija skaitoma vieną kartą šablono atvaizdavimui.
+        version = context.render_context.get('catalog_version')
+        if version is None:
+            version = context.render_context['catalog_version'] = catalog_version()
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = catalog_key(make_template_fragment_key(self.fragment_name, vary_on), version)
+
+        value = cache.get(key)
+        timings = timing.current()
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(key, value, CATALOG_TIMEOUT)
+            if timings is not None:
+                timings.fragment_misses += 1
+        elif timings is not None:
+            timings.fragment_hits += 1
+        return value
+
+
+@register.tag('catalog_fragment')
+def do_catalog_fragment(parser, token):
+    """
+    Šablono fragmentas cache dabartinei katalogo versijai:
+
+        {% load catalog_cache %}
+        {% catalog_fragment "hotel_card" hotel.id %} ... {% endcatalog_fragment %}
+
+    Raktas - fragmento vardas, kintamųjų reikšmės ir katalogo versija, todėl
+    pakeitus viešbutį (bump_catalog_version) fragmentai atnaujinami. Pataikymai
+    ir praleidimai rodomi Server-Timing antraštėje (frag).
+    """
+    nodelist = parser.parse(('endcatalog_fragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' reikia fragmento vardo.")
+    fragment_name = bits[1].strip('"\'')
+    return CatalogFragmentNode(nodelist, fragment_name, [parser.compile_filter(bit) for bit in bits[2:]])
@@ -1,3 +1,969 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.urls import include, path
+from django.db import connection, connections
+from django.db.utils import ConnectionHandler
+from django.test.utils import CaptureQueriesContext
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from .catalog import affordable, bookable_hotels, bookable_options, catalog_key, catalog_page, catalog_version
+from .forms import GROUP_RESERVATION_MAX_LINES
+from .middleware import REPLICA_STICKY_COOKIE, CompressedStaticMiddleware, invalidate_cached_user, load_profile_context
+from .models import (
+    Balance, BalanceLedger, BookingError, DailyHotelStats, Hotel, HotelNight, NoAvailability, Order,
+)
+from .nplusone import NPlusOneError
+from . import async_views, routers
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .search import filter_hotels
+from .services import book_group, book_hotel, create_orders_bulk
+from .storage import brotli
 
-# Create your tests here.
\ No newline at end of file
+
+def n_plus_one_view(request):
+    # Sąmoningas N+1: viešbutis skaitomas atskira užklausa kiekvienam užsakymui.
+    return HttpResponse(', '.join(order.hotel.name for order in Order.objects.all()))
+
+
+urlpatterns = [
+    path('n-plus-one/', n_plus_one_view),
+    path('viesbuciai/', include('viesbuciai.urls')),
+]
+
+
+def make_user(username, cents=0):
+    user = User.objects.create_user(username, password='slaptazodis')
+    profile = user.profile
+    profile.name, profile.lastname = 'Vardas', 'Pavarde'
+    profile.address, profile.city, profile.country = 'Gatve 1', 'Vilnius', 'Lietuva'
+    profile.birth_date = date(1990, 1, 1)
+    profile.save()
+    if cents:
+        BalanceLedger.objects.record(user, cents, BalanceLedger.TOPUP)
+    return user
+
+
+def make_hotel(name='Viesbutis', price=50, availability=1):
+    return Hotel.objects.create(name=name, stars='3', price=price, availability=availability)
+
+
+class BookingTests(TestCase):
+
+    def setUp(self):
+        self.hotel = make_hotel(availability=1)
+        self.r_date = date.today() + timedelta(days=10)
+        self.i_date = self.r_date + timedelta(days=3)
+
+    def test_last_night_cannot_be_oversold(self):
+        first = make_user('pirmas', cents=100000)
+        second = make_user('antras', cents=100000)
+        book_hotel(first, self.hotel, self.r_date, self.i_date)
+
+        # Sutampa tik paskutinė naktis - ji jau parduota.
+        with self.assertRaises(NoAvailability):
+            book_hotel(second, self.hotel, self.i_date - timedelta(days=1), self.i_date + timedelta(days=2))
+
+        nights = HotelNight.objects.for_range(self.hotel, self.r_date, self.i_date + timedelta(days=2))
+        self.assertEqual(list(nights.values_list('sold', flat=True)), [1, 1, 1])
+        self.assertFalse(Order.objects.filter(client=second.profile).exists())
+        self.assertEqual(Balance.objects.get(user=second).cents, 100000)
+
+    def test_delete_releases_nights(self):
+        user = make_user('klientas', cents=100000)
+        order = book_hotel(user, self.hotel, self.r_date, self.i_date)
+        order.delete()
+
+        nights = HotelNight.objects.for_range(self.hotel, self.r_date, self.i_date)
+        self.assertEqual(list(nights.values_list('sold', flat=True)), [0, 0, 0])
+        book_hotel(user, self.hotel, self.r_date, self.i_date)
+
+    def test_delete_of_unreserved_order_keeps_nights(self):
+        user = make_user('klientas', cents=100000)
+        book_hotel(user, self.hotel, self.r_date, self.i_date)
+        Order.objects.create(
+            client=user.profile, hotel=self.hotel, r_date=self.r_date, i_date=self.i_date, reserved=False
+        ).delete()
+
+        nights = HotelNight.objects.for_range(self.hotel, self.r_date, self.i_date)
+        self.assertEqual(list(nights.values_list('sold', flat=True)), [1, 1, 1])
+
+
+
+class GroupReservationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('agentura', cents=100000)
+        self.hotel = make_hotel(name='Be kainos', price=None, availability=5)
+        self.r_date = date.today() + timedelta(days=10)
+        self.i_date = self.r_date + timedelta(days=2)
+
+    def post_group(self, hotel_id):
+        self.client.force_login(self.user)
+        return self.client.post('/viesbuciai/reservation/group/?lines=1', {
+            'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '0',
+            'form-0-hotel': hotel_id, 'form-0-r_date': self.r_date, 'form-0-i_date': self.i_date,
+        })
+
+    def test_hotel_without_price_is_not_bookable(self):
+        self.assertNotIn(self.hotel, bookable_hotels())
+        with self.assertRaises(BookingError):
+            book_hotel(self.user, self.hotel, self.r_date, self.i_date)
+        with self.assertRaises(BookingError):
+            book_group(self.user, [(self.hotel.pk, self.r_date, self.i_date)])
+
+        self.assertEqual(self.post_group(self.hotel.pk).status_code, 200)
+        response = self.client.post(
+            f'/viesbuciai/create_order/{self.hotel.pk}/', {'r_date': self.r_date, 'i_date': self.i_date}
+        )
+        self.assertRedirects(response, '/viesbuciai/hotels/', fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Balance.objects.get(user=self.user).cents, 100000)
+
+    def test_group_charge_is_recorded_per_order(self):
+        first, second = make_hotel(name='Pirmas', price=40), make_hotel(name='Antras', price=25.5)
+        orders_ = book_group(self.user, [(first.pk, self.r_date, self.i_date), (second.pk, self.r_date, self.i_date)])
+
+        charges = BalanceLedger.objects.filter(user=self.user, kind=BalanceLedger.CHARGE)
+        self.assertCountEqual(charges.values_list('order', 'amount'), [(orders_[0].pk, -8000), (orders_[1].pk, -5100)])
+        self.assertEqual(Balance.objects.get(user=self.user).cents, 100000 - 13100)
+
+    def test_line_count_is_clamped(self):
+        self.client.force_login(self.user)
+        for lines, expected in (('-5', 1), ('0', 1), ('3', 3), ('1000', GROUP_RESERVATION_MAX_LINES), ('x', 10)):
+            with self.subTest(lines=lines):
+                response = self.client.get('/viesbuciai/reservation/group/', {'lines': lines})
+                self.assertEqual(len(response.context['formset'].forms), expected)
+
+class ReconcileTests(TestCase):
+
+    def test_drift_is_reported_and_fixed(self):
+        user = make_user('klientas', cents=5000)
+        BalanceLedger.objects.record(user, -1500, BalanceLedger.CHARGE)
+        Balance.objects.filter(user=user).update(cents=999)
+        # Įrašai be Balance kopijos.
+        other = make_user('kitas')
+        BalanceLedger.objects.create(user=other, amount=700, kind=BalanceLedger.TOPUP)
+
+        drift = BalanceLedger.objects.reconcile([user.pk, other.pk])
+
+        self.assertCountEqual(drift, [(user.pk, 999, 3500), (other.pk, None, 700)])
+        self.assertEqual(Balance.objects.get(user=user).cents, 3500)
+        self.assertEqual(Balance.objects.get(user=other).cents, 700)
+        self.assertEqual(BalanceLedger.objects.reconcile([user.pk, other.pk]), [])
+
+    def test_report_only(self):
+        user = make_user('klientas', cents=5000)
+        Balance.objects.filter(user=user).update(cents=1)
+
+        self.assertEqual(BalanceLedger.objects.reconcile([user.pk], fix=False), [(user.pk, 1, 5000)])
+        self.assertEqual(Balance.objects.get(user=user).cents, 1)
+
+
+class RefundTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user('klientas', cents=10000)
+        self.r_date = date.today() + timedelta(days=10)
+        self.i_date = self.r_date + timedelta(days=2)
+
+    def test_deleting_an_order_refunds_its_charge(self):
+        order = book_hotel(self.user, make_hotel(price=30), self.r_date, self.i_date)
+        self.assertEqual(Balance.objects.get(user=self.user).cents, 4000)
+        order.delete()
+
+        refund = BalanceLedger.objects.get(user=self.user, kind=BalanceLedger.REFUND)
+        self.assertEqual(refund.amount, 6000)
+        self.assertEqual(Balance.objects.get(user=self.user).cents, 10000)
+        self.assertEqual(BalanceLedger.objects.reconcile([self.user.pk]), [])
+
+    def test_group_order_refunds_only_its_own_line(self):
+        first, second = make_hotel(name='Pirmas', price=10), make_hotel(name='Antras', price=20)
+        orders_ = book_group(self.user, [(first.pk, self.r_date, self.i_date), (second.pk, self.r_date, self.i_date)])
+        orders_[1].delete()
+
+        self.assertEqual(
+            list(BalanceLedger.objects.filter(kind=BalanceLedger.REFUND).values_list('amount', flat=True)), [4000]
+        )
+        self.assertEqual(Balance.objects.get(user=self.user).cents, 10000 - 2000)
+
+    def test_unpaid_order_and_deleted_user_record_nothing(self):
+        Order.objects.create(client=self.user.profile, hotel=make_hotel(), r_date=self.r_date, i_date=self.i_date).delete()
+        book_hotel(self.user, make_hotel(price=10), self.r_date, self.i_date)
+        self.user.delete()
+        self.assertFalse(BalanceLedger.objects.filter(kind=BalanceLedger.REFUND).exists())
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ProfileContextTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('klientas', cents=5000)
+
+    def test_context_is_cached_until_balance_or_profile_changes(self):
+        with self.assertNumQueries(1):
+            context = load_profile_context(self.user)
+        self.assertEqual((context.complete, context.balance), (True, 50))
+        with self.assertNumQueries(0):
+            load_profile_context(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BalanceLedger.objects.record(self.user, 2500, BalanceLedger.TOPUP)
+        self.assertEqual(load_profile_context(self.user).balance, 75)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.city = ''
+            self.user.profile.save()
+        self.assertFalse(load_profile_context(self.user).complete)
+
+    def test_hotels_page_uses_the_cached_context(self):
+        self.client.force_login(self.user)
+        self.client.get('/viesbuciai/hotels/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/viesbuciai/hotels/')
+        self.assertEqual(response.context['balance'], 50)
+        tables = ('viesbuciai_profile', 'viesbuciai_balance')
+        self.assertFalse([q['sql'] for q in queries if any(table in q['sql'] for table in tables)])
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.ids = [make_hotel(name=f'V{i}').pk for i in range(7)]
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(42)), 42)
+        self.assertIsNone(decode_cursor('ne-kursorius!'))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_forward_and_back(self):
+        pages = [keyset_page(Hotel.objects.all(), 3)]
+        while pages[-1].has_next():
+            pages.append(keyset_page(Hotel.objects.all(), 3, after=pages[-1].next_cursor))
+        self.assertEqual([[hotel.pk for hotel in page] for page in pages],
+                         [self.ids[0:3], self.ids[3:6], self.ids[6:7]])
+        self.assertFalse(pages[0].has_previous())
+
+        # Atgal kursoriumi grįžtama į tuos pačius puslapius.
+        back = keyset_page(Hotel.objects.all(), 3, before=pages[2].previous_cursor)
+        self.assertEqual([hotel.pk for hotel in back], self.ids[3:6])
+        back = keyset_page(Hotel.objects.all(), 3, before=back.previous_cursor)
+        self.assertEqual([hotel.pk for hotel in back], self.ids[0:3])
+        self.assertFalse(back.has_previous())
+
+    def test_descending_key(self):
+        first = keyset_page(Hotel.objects.all(), 4, key='-id')
+        second = keyset_page(Hotel.objects.all(), 4, after=first.next_cursor, key='-id')
+        self.assertEqual([hotel.pk for hotel in first] + [hotel.pk for hotel in second], self.ids[::-1])
+        self.assertFalse(second.has_next())
+
+
+class HotelSearchTests(TestCase):
+
+    def setUp(self):
+        self.by_name = Hotel.objects.create(
+            name='Vilniaus Centras', stars='4', availability=1, address='Gedimino pr. 1'
+        )
+        self.by_address = Hotel.objects.create(name='Kauno Smiltė', stars='3', availability=1, address='Vilniaus g. 5')
+        Hotel.objects.create(name='Jūra', stars='3', availability=1, description='Prie jūros, su baseinu')
+
+    def names(self, q, **filters):
+        return [hotel.name for hotel in filter_hotels(q=q, **filters)]
+
+    def test_prefix_terms_are_ranked_by_name_first(self):
+        self.assertEqual(self.names('viln'), ['Vilniaus Centras', 'Kauno Smiltė'])
+        self.assertEqual(self.names('viln', stars='3'), ['Kauno Smiltė'])
+        self.assertEqual(self.names('smilte'), ['Kauno Smiltė'])
+        self.assertEqual(self.names('jura basein'), ['Jūra'])
+        self.assertEqual(self.names('viln basein'), [])
+
+    def test_index_follows_changes_and_survives_rebuild(self):
+        self.by_name.name = 'Trakų Pilis'
+        self.by_name.save()
+        self.by_address.delete()
+        self.assertEqual(self.names('viln'), [])
+        self.assertEqual(self.names('trak'), ['Trakų Pilis'])
+
+        call_command('rebuild_hotel_search', stdout=StringIO())
+        self.assertEqual(self.names('trak'), ['Trakų Pilis'])
+        self.assertEqual(self.names('gedimino'), ['Trakų Pilis'])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class OrderListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin')
+        cls.first, cls.second = make_hotel(name='Pirmas', availability=10), make_hotel(name='Antras', availability=10)
+        start = date.today() + timedelta(days=30)
+        cls.orders = [
+            Order.objects.create(
+                client=cls.admin.profile, hotel=hotel, status=status,
+                r_date=start + timedelta(days=i), i_date=start + timedelta(days=i + 1)
+            )
+            for i, (hotel, status) in enumerate([
+                (cls.first, 'u'), (cls.second, 'p'), (cls.first, 'u'), (cls.first, 'p'), (cls.first, 'u'),
+            ])
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def listed(self, **params):
+        response = self.client.get('/viesbuciai/orders/', params)
+        return response, [order.pk for order in response.context['orders_']]
+
+    def test_query_count_does_not_grow_with_orders(self):
+        with CaptureQueriesContext(connection) as before:
+            self.listed()
+        start = date.today() + timedelta(days=60)
+        for i in range(10):
+            Order.objects.create(client=self.admin.profile, hotel=self.second, r_date=start, i_date=start + timedelta(days=1))
+        with CaptureQueriesContext(connection) as after:
+            self.listed()
+        self.assertEqual(len(after), len(before))
+
+    def test_filters_are_kept_across_pages(self):
+        first, _, third, _, fifth = self.orders
+        with mock.patch('viesbuciai.views.ORDERS_PER_PAGE', 2):
+            response, ids = self.listed(status='u', hotel=self.first.pk)
+            self.assertEqual(ids, [fifth.pk, third.pk])
+            self.assertIn(f'hotel={self.first.pk}', response.context['filters'])
+
+            _, ids = self.listed(status='u', hotel=self.first.pk, after=response.context['orders_'].next_cursor)
+            self.assertEqual(ids, [first.pk])
+
+        _, ids = self.listed(date_from=third.r_date, date_to=third.r_date)
+        self.assertEqual(ids, [third.pk])
+
+    def test_unknown_hotel_id_is_a_form_error(self):
+        response, ids = self.listed(hotel=0)
+        self.assertEqual(response.context['form'].errors['hotel'], ['Viešbučio su tokiu ID nėra.'])
+        self.assertEqual(len(ids), len(self.orders))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class UserDirectoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin')
+        cls.jonas = make_user('jonas', cents=1234)
+        cls.ona = make_user('ona')
+        cls.ona.profile.city = 'Kaunas'
+        cls.ona.profile.save()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def listed(self, **params):
+        response = self.client.get('/viesbuciai/users/', params)
+        return response, {row['user'].username: row for row in response.context['users']}
+
+    def test_query_count_does_not_grow_with_users(self):
+        with CaptureQueriesContext(connection) as before:
+            _, rows = self.listed()
+        self.assertEqual(rows['jonas']['balance'], Decimal('12.34'))
+        self.assertEqual(rows['ona']['profile'].city, 'Kaunas')
+        for i in range(10):
+            make_user(f'vartotojas{i}', cents=100)
+        with CaptureQueriesContext(connection) as after:
+            self.listed()
+        self.assertEqual(len(after), len(before))
+
+    def test_search_by_username_or_profile_prefix(self):
+        self.assertEqual(set(self.listed(q='jon')[1]), {'jonas'})
+        self.assertEqual(set(self.listed(q='kaun')[1]), {'ona'})
+        self.assertEqual(set(self.listed(q='vilni')[1]), {'admin', 'jonas'})
+
+    def test_pages_follow_the_cursor(self):
+        with mock.patch('viesbuciai.views.USERS_PER_PAGE', 2):
+            response, first = self.listed()
+            _, second = self.listed(after=response.context['page'].next_cursor)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(set(first) | set(second), {'admin', 'jonas', 'ona'})
+
+
+class BulkOrderTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user('klientas')
+        self.hotel = make_hotel(availability=30)
+        self.r_date = date.today() + timedelta(days=10)
+        self.i_date = self.r_date + timedelta(days=2)
+
+    def new_orders(self, count, hotel=None):
+        return [
+            Order(client=self.user.profile, hotel=hotel or self.hotel, r_date=self.r_date, i_date=self.i_date)
+            for _ in range(count)
+        ]
+
+    def test_save_writes_the_order_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.new_orders(1)[0].save()
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('INSERT INTO "viesbuciai_order"',
+                                                                   'UPDATE "viesbuciai_order"'))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+
+    def test_bulk_query_count_does_not_grow_with_orders(self):
+        with CaptureQueriesContext(connection) as few:
+            create_orders_bulk(self.new_orders(2))
+        with CaptureQueriesContext(connection) as many:
+            orders_ = create_orders_bulk(self.new_orders(20))
+        self.assertEqual(len(many), len(few))
+        self.assertTrue(all(order.pk and order.admin_details_id for order in orders_))
+        nights = HotelNight.objects.for_range(self.hotel, self.r_date, self.i_date)
+        self.assertEqual(list(nights.values_list('sold', flat=True)), [22, 22])
+
+    def test_full_night_rejects_the_whole_batch(self):
+        with self.assertRaises(BookingError):
+            create_orders_bulk(self.new_orders(31))
+        self.assertFalse(Order.objects.exists())
+
+    def test_import_orders_skips_only_bad_rows(self):
+        small = make_hotel(name='Mažas', availability=1)
+        rows = [
+            ('klientas', self.hotel.pk, self.r_date, self.i_date),
+            ('klientas', small.pk, self.r_date, self.i_date),
+            ('klientas', small.pk, self.r_date, self.i_date),
+            ('nezinomas', self.hotel.pk, self.r_date, self.i_date),
+            ('klientas', self.hotel.pk, self.i_date, self.r_date),
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write('username,hotel_id,r_date,i_date\n')
+            f.writelines(','.join(map(str, row)) + '\n' for row in rows)
+        self.addCleanup(os.remove, f.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_orders', f.name, stdout=stdout, stderr=stderr)
+        self.assertIn('Sukurta užsakymų: 2, praleista: 3.', stdout.getvalue())
+        self.assertIn('Eilutė 4: nėra laisvų vietų', stderr.getvalue())
+        self.assertEqual(Order.objects.filter(hotel=small).count(), 1)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ServerTimingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        make_hotel()
+
+    @override_settings(SERVER_TIMING_LOG=True)
+    def test_header_and_log_line(self):
+        self.client.force_login(make_user('klientas', cents=10000))
+        with self.assertLogs('viesbuciai.timing') as logs:
+            response = self.client.get('/viesbuciai/hotels/')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="[1-9]\d* queries", tpl;dur=[\d.]+, app;dur=[\d.]+, total;dur=[\d.]+'
+        )
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['view'], line['status']), ('hotels', 200))
+        self.assertGreater(line['template_ms'], 0)
+        self.assertGreater(line['queries'], 0)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_have_no_header(self):
+        self.assertNotIn('Server-Timing', self.client.get('/viesbuciai/api/v1/hotels/'))
+
+
+# Be collectstatic nėra manifest'o - šablonams naudojama paprasta static saugykla.
+@override_settings(
+    ROOT_URLCONF='viesbuciai.tests', NPLUSONE_ENABLED=True, NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=5,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class NPlusOneTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin')
+        start = date.today() + timedelta(days=30)
+        for i in range(8):
+            Order.objects.create(
+                client=cls.admin.profile, hotel=make_hotel(name=f'V{i}'), r_date=start, i_date=start + timedelta(days=2)
+            )
+
+    def test_n_plus_one_view_raises(self):
+        with self.assertRaisesMessage(NPlusOneError, 'n_plus_one_view'):
+            self.client.get('/n-plus-one/')
+
+    def test_list_views_have_no_n_plus_one(self):
+        self.client.force_login(self.admin)
+        for url in ('/viesbuciai/orders/', '/viesbuciai/users/', '/viesbuciai/reports/daily/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class CatalogApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hotels = [make_hotel(name=f'V{i}', price=50 + i) for i in range(3)]
+
+    def test_unchanged_catalog_is_not_modified_without_queries(self):
+        url = '/viesbuciai/api/v1/hotels/?fields=id,name'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['results'][0], {'id': self.hotels[0].pk, 'name': 'V0'})
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        self.assertNotEqual(self.client.get('/viesbuciai/api/v1/hotels/?fields=id')['ETag'], first['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotels[0].name = 'Naujas'
+            self.hotels[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], 'Naujas')
+
+    def test_list_pages_filter_and_detail(self):
+        with mock.patch('viesbuciai.api.API_PAGE_SIZE', 2):
+            first = self.client.get('/viesbuciai/api/v1/hotels/?fields=id').json()
+            second = self.client.get('/viesbuciai/api/v1/hotels/', {'fields': 'id', 'after': first['next']}).json()
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], [h.pk for h in self.hotels])
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+        response = self.client.get('/viesbuciai/api/v1/hotels/filter/', {'name': 'v1', 'fields': 'name,price'})
+        self.assertEqual(response.json()['results'], [{'name': 'V1', 'price': 51}])
+        self.assertEqual(self.client.get(f'/viesbuciai/api/v1/hotels/{self.hotels[2].pk}/').json()['price'], 52)
+        self.assertEqual(self.client.get('/viesbuciai/api/v1/hotels/0/').status_code, 404)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('klientas', cents=10000)
+        self.hotel = make_hotel(name='Pigus', price=40, availability=1)
+        self.r_date = date.today() + timedelta(days=10)
+        self.i_date = self.r_date + timedelta(days=2)
+
+    def get(self, url, user=None):
+        request = RequestFactory().get(url)
+        request.user = user or self.user
+        return request
+
+    async def test_hotels_and_my_orders(self):
+        response = await async_views.hotels(self.get('/viesbuciai/hotels/'))
+        self.assertContains(response, f'<option value="{self.hotel.pk}">Pigus</option>')
+
+        response = await async_views.my_orders(self.get('/viesbuciai/myorders/'))
+        self.assertNotContains(response, 'Pigus')
+        await sync_to_async(book_hotel)(self.user, self.hotel, self.r_date, self.i_date)
+        response = await async_views.my_orders(self.get('/viesbuciai/myorders/'))
+        self.assertContains(response, 'Pigus')
+
+        incomplete = await sync_to_async(User.objects.create_user)('naujas')
+        response = await async_views.hotels(self.get('/viesbuciai/hotels/', incomplete))
+        self.assertEqual(response.url, '/viesbuciai/accounts/profile/')
+
+    async def test_availability(self):
+        url = f'/viesbuciai/hotels/{self.hotel.pk}/availability/'
+        dates = {'r_date': self.r_date.isoformat(), 'i_date': self.i_date.isoformat()}
+        response = await self.async_client.get(url, dates)
+        self.assertIs(response.json()['available'], True)
+
+        await sync_to_async(book_hotel)(self.user, self.hotel, self.r_date, self.i_date)
+        response = await self.async_client.get(url, dates)
+        self.assertIs(response.json()['available'], False)
+
+        response = await self.async_client.get(url, {'r_date': dates['i_date'], 'i_date': dates['r_date']})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get('/viesbuciai/hotels/0/availability/', dates)
+        self.assertEqual(response.status_code, 404)
+
+
+class DailyStatsTests(TestCase):
+
+    def stats(self):
+        return list(DailyHotelStats.objects.filter(hotel=self.hotel).values_list(
+            'date', 'capacity', 'rooms_sold', 'revenue_cents'
+        ))
+
+    def test_incremental_stats_match_a_rebuild(self):
+        self.hotel = make_hotel(price=50, availability=3)
+        user = make_user('klientas', cents=100000)
+        day = date.today() + timedelta(days=10)
+
+        edited = book_hotel(user, self.hotel, day, day + timedelta(days=3))
+        [cancelled] = create_orders_bulk([
+            Order(client=user.profile, hotel=self.hotel, r_date=day + timedelta(days=1), i_date=day + timedelta(days=2))
+        ])
+        edited.i_date = day + timedelta(days=2)
+        edited.save()
+        self.hotel.price = 80
+        self.hotel.save()
+        book_hotel(user, self.hotel, day, day + timedelta(days=1))
+        cancelled.delete()
+
+        incremental = self.stats()
+        self.assertEqual(incremental[:2], [(day, 3, 2, 13000), (day + timedelta(days=1), 3, 1, 5000)])
+        self.assertFalse([row for row in incremental[2:] if row[2:] != (0, 0)])
+
+        DailyHotelStats.objects.update(rooms_sold=0, revenue_cents=0)
+        call_command('rebuild_daily_stats', '--hotel', str(self.hotel.pk), stdout=StringIO())
+        self.assertEqual(self.stats(), incremental)
+
+
+class CalendarApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hotel = make_hotel(availability=2)
+
+    def test_etag_changes_with_the_day_when_start_is_implicit(self):
+        url = f'/viesbuciai/api/v1/hotels/{self.hotel.pk}/calendar/'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['start'], date.today().isoformat())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        tomorrow = date.today() + timedelta(days=1)
+
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return tomorrow
+
+        with mock.patch('viesbuciai.api.date', Tomorrow):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['start'], tomorrow.isoformat())
+
+
+class ImportHotelsTests(TestCase):
+
+    def import_csv(self, text):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hotels.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            call_command('import_hotels', path, stdout=StringIO())
+            rejects = os.path.join(directory, 'hotels.csv.rejects.csv')
+            if not os.path.exists(rejects):
+                return ''
+            with open(rejects, encoding='utf-8') as f:
+                return f.read()
+
+    def test_new_hotels_need_every_column_without_a_valid_default(self):
+        rejects = self.import_csv('external_id,name,price,availability\nx1,A,55,5\n')
+        self.assertIn('stars: Privalomas stulpelis naujam viešbučiui.', rejects)
+        self.assertFalse(Hotel.objects.exists())
+
+        self.assertEqual(self.import_csv('external_id,name,stars,price,availability\nx1,A,3,55,5\n'), '')
+        Hotel.objects.get(external_id='x1').full_clean()
+
+    def test_partial_file_updates_only_its_columns(self):
+        Hotel.objects.create(external_id='x1', name='A', stars='4', price=55, availability=5, quantity=3)
+
+        self.assertEqual(self.import_csv('external_id,price\nx1,60\n'), '')
+        hotel = Hotel.objects.get(external_id='x1')
+        self.assertEqual((hotel.name, hotel.stars, hotel.price, hotel.availability, hotel.quantity), ('A', '4', 60, 5, 3))
+        hotel.full_clean()
+
+
+class ScratchDatabaseTests(SimpleTestCase):
+
+    def test_project_database_is_refused(self):
+        for profile in settings.DATABASE_PROFILES.values():
+            if profile['ENGINE'] == 'django.db.backends.sqlite3':
+                with self.assertRaisesMessage(CommandError, 'projekto duomenų bazė'):
+                    call_command('seed_data', '--db', str(profile['NAME']), '--force')
+
+    def test_existing_file_needs_force(self):
+        name = connections['default'].settings_dict['NAME']
+        with tempfile.NamedTemporaryFile(suffix='.sqlite3') as f:
+            for command in ('seed_data', 'benchmark_urls', 'bench_async', 'booking_stress'):
+                with self.subTest(command=command), self.assertRaisesMessage(CommandError, '--force'):
+                    call_command(command, '--db', f.name)
+        # Atmetus failą, jungtis neperjungiama.
+        self.assertEqual(connections['default'].settings_dict['NAME'], name)
+
+
+class ExportTests(TestCase):
+
+    def test_order_export_uses_the_booked_price(self):
+        admin = make_user('admin', cents=100000)
+        hotel = make_hotel(price=55.5, availability=3)
+        r_date = date.today() + timedelta(days=5)
+        order = book_hotel(admin, hotel, r_date, r_date + timedelta(days=2))
+        hotel.price = 80
+        hotel.save()
+
+        self.client.force_login(admin)
+        response = self.client.get('/viesbuciai/export/orders/', {'format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['id'], row['price']) for row in rows], [(order.pk, '55.50')])
+
+        response = self.client.get('/viesbuciai/export/orders/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(',55.50,', lines[1])
+
+
+class CompressedStaticTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(STATIC_ROOT=cls.root.name)
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root.name, 'staticfiles.json'), encoding='utf-8') as f:
+            cls.hashed = json.load(f)['paths']['css/styles.css']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def get(self, path, encoding=''):
+        middleware = CompressedStaticMiddleware(lambda request: HttpResponse(status=404))
+        response = middleware(RequestFactory().get(path, HTTP_ACCEPT_ENCODING=encoding))
+        response.close()
+        return response
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        response = self.get(f'/static/{self.hashed}', 'gzip, br;q=0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        self.assertFalse(self.get(f'/static/{self.hashed}', 'gzip;q=0').has_header('Content-Encoding'))
+        self.assertEqual(self.get('/static/css/styles.css')['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.get('/viesbuciai/').status_code, 404)
+
+    @skipUnless(brotli, 'brotli neįdiegtas')
+    def test_brotli_is_preferred(self):
+        self.assertTrue(os.path.exists(os.path.join(self.root.name, self.hashed + '.br')))
+        self.assertEqual(self.get(f'/static/{self.hashed}', 'gzip, br')['Content-Encoding'], 'br')
+
+
+def cached_auth_settings(directory):
+    middleware = [
+        'viesbuciai.middleware.CachedAuthenticationMiddleware'
+        if name == 'django.contrib.auth.middleware.AuthenticationMiddleware' else name
+        for name in settings.MIDDLEWARE
+    ]
+    return override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}},
+        MIDDLEWARE=middleware, SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+        STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    )
+
+
+class CachedAuthenticationTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_ = cached_auth_settings(directory.name)
+        settings_.enable()
+        self.addCleanup(settings_.disable)
+        self.user = make_user('klientas', cents=1000)
+        self.client.login(username='klientas', password='slaptazodis')
+
+    def test_logged_in_request_reads_no_session_user_or_profile(self):
+        self.assertEqual(self.client.get('/viesbuciai/hotels/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/viesbuciai/hotels/').status_code, 200)
+        sql = ' '.join(query['sql'] for query in queries)
+        for table in ('django_session', 'auth_user', 'viesbuciai_profile', 'viesbuciai_balance'):
+            self.assertNotIn(table, sql)
+
+    def test_password_change_and_deactivation_end_the_session(self):
+        self.client.get('/viesbuciai/hotels/')
+        self.user.set_password('Naujas123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get('/viesbuciai/hotels/').status_code, 302)
+
+        self.client.login(username='klientas', password='Naujas123')
+        self.assertEqual(self.client.get('/viesbuciai/hotels/').status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        invalidate_cached_user(self.user.pk)
+        self.assertEqual(self.client.get('/viesbuciai/hotels/').status_code, 302)
+
+
+class DatabaseProfileTests(SimpleTestCase):
+
+    def test_sqlite_profile_applies_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profile = {**settings.DATABASE_PROFILES['sqlite'], 'NAME': os.path.join(directory, 'db.sqlite3')}
+            handler = ConnectionHandler({'default': profile})
+            try:
+                with handler['default'].cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store'):
+                        cursor.execute(f"PRAGMA {name}")
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                handler.close_all()
+        # synchronous NORMAL = 1, temp_store MEMORY = 2.
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2})
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class HotelOptionsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cheap = make_hotel(name='Pigus', price=40)
+        self.exact = make_hotel(name='Tikslus', price=100)
+        self.expensive = make_hotel(name='Brangus', price=150)
+        make_hotel(name='Be kainos', price=None)
+        make_hotel(name='Pilnas', price=10, availability=0)
+
+    def test_options_are_sorted_cached_and_filtered_by_balance(self):
+        options = bookable_options()
+        self.assertEqual([option['name'] for option in options], ['Pigus', 'Tikslus', 'Brangus'])
+        with self.assertNumQueries(0):
+            self.assertEqual(bookable_options(), options)
+        self.assertEqual([option['id'] for option in affordable(options, 100)], [self.cheap.pk, self.exact.pk])
+        self.assertEqual(affordable(options, 39.99), [])
+
+    def test_hotels_page_offers_only_affordable_hotels(self):
+        user = make_user('klientas', cents=10000)
+        self.client.force_login(user)
+        response = self.client.get('/viesbuciai/hotels/')
+        self.assertEqual([option['name'] for option in response.context['hotels']], ['Pigus', 'Tikslus'])
+        self.assertContains(response, f'<option value="{self.exact.pk}">Tikslus</option>')
+        self.assertNotContains(response, f'<option value="{self.expensive.pk}">Brangus</option>')
+
+
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hotel_changes_start_a_new_catalog_version(self):
+        hotel = make_hotel(name='Senas', price=50)
+        version = catalog_version()
+        self.assertEqual([option['name'] for option in bookable_options()], ['Senas'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hotel.name = 'Naujas'
+            hotel.save()
+        self.assertNotEqual(catalog_version(), version)
+        self.assertEqual([option['name'] for option in bookable_options()], ['Naujas'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hotel.delete()
+        self.assertEqual(bookable_options(), [])
+
+    def test_prewarm_fills_the_current_version(self):
+        for i in range(5):
+            make_hotel(name=f'V{i}')
+        call_command('prewarm_catalog', '--pages', '2', stdout=StringIO())
+        self.assertIsNotNone(cache.get(catalog_key('bookable_options')))
+        with self.assertNumQueries(0):
+            page = catalog_page()
+            catalog_page(after=page.next_cursor)
+
+
+REPLICA = 'replica1'
+
+
+@override_settings(
+    DATABASE_REPLICAS=[REPLICA], DATABASE_ROUTERS=['viesbuciai.routers.ReplicaRouter'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Pagrindinė db ir antras SQLite failas kaip replika (sync_replicas kopija).
+    Po kopijavimo pagrindinėje db daromi pakeitimai - replika "atsilieka".
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA] = {
+            **connections['default'].settings_dict, 'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('klientas', cents=100000)
+        self.hotel = make_hotel(availability=5)
+        self.r_date = date.today() + timedelta(days=10)
+        self.synced = book_hotel(self.user, self.hotel, self.r_date, self.r_date + timedelta(days=1))
+        call_command('sync_replicas', stdout=StringIO())
+        # Replikoje jo dar nėra.
+        self.lagging = book_hotel(self.user, self.hotel, self.r_date, self.r_date + timedelta(days=2))
+        self.client.force_login(self.user)
+
+    def my_order_ids(self):
+        return {order.pk for order in self.client.get('/viesbuciai/myorders/').context['orders']}
+
+    def test_replica_reads_view_reads_the_replica(self):
+        self.assertEqual(self.my_order_ids(), {self.synced.pk})
+        self.assertNotIn(REPLICA_STICKY_COOKIE, self.client.cookies)
+
+    def test_write_sets_sticky_cookie_and_next_read_uses_primary(self):
+        response = self.client.post(
+            f'/viesbuciai/create_order/{self.hotel.pk}/',
+            {'r_date': self.r_date, 'i_date': self.r_date + timedelta(days=3)},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertEqual(len(self.my_order_ids()), 3)
+
+        del self.client.cookies[REPLICA_STICKY_COOKIE]
+        self.assertEqual(self.my_order_ids(), {self.synced.pk})
+
+    def test_export_stream_reads_the_replica(self):
+        admin = make_user('admin')
+        call_command('sync_replicas', stdout=StringIO())
+        book_hotel(self.user, self.hotel, self.r_date + timedelta(days=1), self.r_date + timedelta(days=2))
+
+        self.client.force_login(admin)
+        response = self.client.get('/viesbuciai/export/orders/', {'format': 'ndjson'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual({json.loads(row)['id'] for row in rows}, {self.synced.pk, self.lagging.pk})
+
+    def test_atomic_block_and_bound_stream(self):
+        request = RequestFactory().get('/viesbuciai/myorders/')
+        request.resolver_match = resolve(request.path)
+        state, token = routers.start(request)
+        try:
+            self.assertEqual(Order.objects.db, REPLICA)
+            with transaction.atomic():
+                self.assertEqual(Order.objects.db, 'default')
+            stream = routers.bound(Order.objects.db for _ in range(2))
+        finally:
+            routers.stop(token)
+        # Srautas skaitomas jau išėjus iš middleware - būsena pririšta bound().
+        self.assertEqual(Order.objects.db, 'default')
+        self.assertEqual(list(stream), [REPLICA, REPLICA])
+        self.assertEqual(Order.objects.db, 'default')
@@ -0,0 +1,127 @@
+from contextvars import ContextVar
+from time import perf_counter
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+# Matuojamos užklausos duomenys. ContextVar perduodamas ir į sync_to_async
+# gijas, todėl skaičiuojamos ir async view'sų užklausos į DB.
+_current = ContextVar('viesbuciai_request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Vienos užklausos laikai sekundėmis: DB (užklausų kiekis ir trukmė),
+    šablonų atvaizdavimas (be jame vykdytų DB užklausų) ir bendras laikas.
+    Taip pat šablonų fragmentų cache pataikymai ir praleidimai.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.total = 0.0
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+        # Atvaizduojamų šablonų gylis (include, crispy formos atvaizduoja šablonus viduje).
+        self.template_depth = 0
+
+    @property
+    def app(self):
+        return max(self.total - self.db - self.template, 0.0)
+
+    def header(self):
+        header = (
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+            f'tpl;dur={self.template * 1000:.1f}, '
+            f'app;dur={self.app * 1000:.1f}, '
+            f'total;dur={self.total * 1000:.1f}'
+        )
+        if self.fragment_hits or self.fragment_misses:
+            header += f', frag;desc="{self.fragment_hits} hit, {self.fragment_misses} miss"'
+        return header
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db * 1000, 2),
+            'template_ms': round(self.template * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+            'fragment_hits': self.fragment_hits,
+            'fragment_misses': self.fragment_misses,
+        }
+
+
+def start():
+    """
+    Pradeda matuoti einamąją užklausą.
+    :return: (RequestTimings, žetonas stop() funkcijai).
+    """
+    install_query_timer(connections)
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def timed_execute(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_timer(connections_):
+    for connection in connections_.all():
+        if timed_execute not in connection.execute_wrappers:
+            connection.execute_wrappers.append(timed_execute)
+
+
+@receiver(connection_created)
+def add_query_timer(sender, connection, **kwargs):
+    # Naujos jungtys (ir kitose gijose) gauna matuoklį iš karto.
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+class TimedTemplate(Template):
+    """
+    Matuojamas tik išorinis atvaizdavimas: viduje atvaizduoti šablonai jau
+    įeina į jo laiką ir nebūtų skaičiuojami du kartus.
+    """
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None or timings.template_depth:
+            return super().render(context, request)
+        started, db = perf_counter(), timings.db
+        timings.template_depth += 1
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_depth -= 1
+            timings.template += perf_counter() - started - (timings.db - db)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates, kuris matuoja šablonų atvaizdavimo laiką (Server-Timing tpl).
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -1,23 +1,35 @@
 from django.urls import path, include
-from . import views
-from .views import profile, register, my_orders, edit_order, orders, delete_hotel
+from django.conf import settings
+from . import views, api, async_views
+from .views import profile, register, edit_order, orders, delete_hotel
+
+# ASGI serveryje skaitymo puslapiai aptarnaujami async view'sais.
+browse = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', views.main_page, name='index'),
-    path('hotels/', views.hotels, name='hotels'),
+    path('hotels/', browse.hotels, name='hotels'),
     path('reservation/', views.make_reservation, name='reservation'),
     path('create_order/<int:hotel_id>/', views.create_order, name='create_order'),
+    path('reservation/group/', views.group_reservation, name='group_reservation'),
     path('order_confirmation/<int:order_id>/', views.order_confirmation, name='order_confirmation'),
     path('accounts/', include('django.contrib.auth.urls')),
     path('accounts/profile/', profile, name='profile'),
     path('register/', register, name='register'),
-    path('myorders/', my_orders, name='orders'),
+    path('myorders/', browse.my_orders, name='orders'),
     path('orders/', orders, name='orders_'),
     path('editorder/<int:pk>', edit_order, name='edit_order'),
-    path('hotels/filter/', views.hotel_filter, name='hotel_filter'),
+    path('hotels/filter/', browse.hotel_filter, name='hotel_filter'),
+    path('hotels/<int:pk>/availability/', async_views.hotel_availability, name='hotel_availability'),
     path('hotels/<int:pk>/delete/', delete_hotel, name='delete_hotel'),
     path('add_balance/<int:user_id>', views.add_user_balance_view, name="add_balance"),
     path('users/', views.all_users_view, name="all_users"),
-    path('addhotel', views.add_hotel_view, name="add_hotel")
+    path('addhotel', views.add_hotel_view, name="add_hotel"),
+    path('export/<str:kind>/', views.export_view, name="export"),
+    path('reports/daily/', views.daily_report, name="daily_report"),
+    path('api/v1/hotels/', api.hotel_list, name="api_hotels"),
+    path('api/v1/hotels/filter/', api.hotel_filter, name="api_hotel_filter"),
+    path('api/v1/hotels/<int:pk>/', api.hotel_detail, name="api_hotel"),
+    path('api/v1/hotels/<int:pk>/calendar/', api.hotel_calendar_view, name="api_hotel_calendar"),
 
 ]
@@ -1,16 +1,35 @@
-from django.core.paginator import Paginator
-from .models import Balance, Hotel, Order, AdminDetails
+from .models import Balance, BalanceLedger, Hotel, Order, AdminDetails, HotelNight, DailyHotelStats, BookingError, \
+    to_cents
+from .services import book_group, book_hotel
+from .middleware import invalidate_cached_user, invalidate_profile_context
+from .catalog import affordable, bookable_hotels, bookable_options, bump_catalog_version, catalog_page
+from .occupancy import bump_calendar_version
+from .reports import daily_rows, hotel_totals, order_stay, record_order_change
+from .search import filter_hotels
+from .pagination import keyset_page
+from .routers import bound, replica_reads
+from .exports import EXPORTS, FORMATS, export_rows
 from django.shortcuts import render, redirect, HttpResponseRedirect
+from django.http import StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from .forms import ProfileForm, RegistrationForm, HotelSelectForm, OrderForm, EditAdminDetailsForm, \
-    EditOrderForm, HotelForm
+from .forms import ProfileForm, RegistrationForm, OrderForm, EditAdminDetailsForm, \
+    EditOrderForm, HotelForm, OrderFilterForm, DailyReportForm, group_reservation_formset, GROUP_RESERVATION_MAX_LINES
 from .models import Profile
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.core.exceptions import ObjectDoesNotExist
-from datetime import date
+from django.db import transaction
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import OuterRef, Q, QuerySet, Subquery, Sum
+
+ORDERS_PER_PAGE = getattr(settings, 'ORDERS_PER_PAGE', 50)
+USERS_PER_PAGE = getattr(settings, 'USERS_PER_PAGE', 50)
+REPORT_DAYS = 30
+EXPORT_FILTER_FORMS = {'orders': OrderFilterForm, 'daily': DailyReportForm}
 
 
 @login_required(login_url="/viesbuciai/accounts/login/")
@@ -70,6 +89,97 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
 
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=Balance)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_profile_context(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Profile)
+def invalidate_user_cache(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+@receiver(post_save, sender=BalanceLedger)
+def invalidate_cached_balance(sender, instance, created, **kwargs):
+    transaction.on_commit(lambda: invalidate_profile_context(instance.user_id))
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def invalidate_hotel_catalog(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Hotel)
+def sync_hotel_night_capacity(sender, instance, created, **kwargs):
+    # Pakeitus kambarių kiekį, atnaujinama būsimų nakčių talpa.
+    if not created:
+        HotelNight.objects.filter(hotel=instance, date__gte=date.today()).update(capacity=instance.availability)
+        DailyHotelStats.objects.filter(hotel=instance, date__gte=date.today()).update(capacity=instance.availability)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_hotel_calendar(sender, instance, **kwargs):
+    hotel_id = instance.pk if sender is Hotel else instance.hotel_id
+    transaction.on_commit(lambda: bump_calendar_version(hotel_id))
+
+
+@receiver(post_init, sender=Order)
+def remember_order_stay(sender, instance, **kwargs):
+    # Išsaugomas įkeltas intervalas, kad redaguojant būtų žinoma, ką atimti iš suvestinės.
+    instance._stay = order_stay(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_daily_stats(sender, instance, created, **kwargs):
+    # Jeigu senas intervalas nežinomas (atidėti laukai), suvestinę sutvarko rebuild_daily_stats.
+    stay = order_stay(instance)
+    old = None if created else instance._stay
+    if stay is not None and (created or old is not None):
+        record_order_change(instance, old, stay)
+    instance._stay = stay
+
+
+@receiver(post_delete, sender=Order)
+def cancel_daily_stats(sender, instance, **kwargs):
+    record_order_change(instance, instance._stay, None)
+
+
+@receiver(post_delete, sender=Order)
+def release_order_nights(sender, instance, **kwargs):
+    # Be rezervavimo importuoti užsakymai kambarių nelaiko - nėra ko atlaisvinti.
+    if instance.reserved and instance.hotel_id and instance.r_date and instance.i_date:
+        HotelNight.objects.release(instance.hotel_id, instance.r_date, instance.i_date)
+
+
+@receiver(pre_delete, sender=Order)
+def remember_order_payment(sender, instance, origin=None, **kwargs):
+    # Užsakymo įrašų ryšys (SET_NULL) nutraukiamas dar prieš post_delete - suma
+    # apskaičiuojama dabar. Trinant patį vartotoją (kaskada) grąžinti nėra kam.
+    owner = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if owner in (User, Profile):
+        instance._paid = {}
+        return
+    instance._paid = dict(
+        BalanceLedger.objects.filter(order=instance).order_by().values('user_id')
+        .annotate(total=Sum('amount')).values_list('user_id', 'total')
+    )
+
+
+@receiver(post_delete, sender=Order)
+def refund_order(sender, instance, **kwargs):
+    # Atšaukus užsakymą grąžinama tai, kas už jį nurašyta (atėmus jau grąžintas sumas).
+    for user_id, total in getattr(instance, '_paid', {}).items():
+        if total < 0:
+            BalanceLedger.objects.record(user_id, -total, BalanceLedger.REFUND)
+
 #################################
 
 
@@ -80,22 +190,10 @@ def main_page(request):
     :return: grįžtama atgal į profilį, kol profilis nėra pilnai užpildytas.
     """
     if request.user.is_authenticated:
-        profile_ = Profile.objects.get(user=request.user)
-
-        # Naujas vartotojas be balanco
-        try:
-            balance = Balance.objects.get(user=request.user)
-        except ObjectDoesNotExist:
-            balance = Balance.objects.create(user=request.user, balance=0)
-            balance.save()
-
-        ##########################
-
-        if profile_.name and profile_.lastname and profile_.address and \
-                profile_.birth_date and profile_.city and profile_.country:
+        if request.profile_context.complete:
 
             context = {
-                "balance": round(balance.balance, 2)
+                "balance": request.profile_context.balance
             }
             return render(request, 'index.html', context=context)
         else:
@@ -105,6 +203,7 @@ def main_page(request):
 
 
 @login_required(login_url="/viesbuciai/accounts/login/")
+@replica_reads
 def hotels(request):
     """
     Viešbučių view'sas.
@@ -113,34 +212,18 @@ def hotels(request):
     Neužpildžius profilio, grįžtama atgal.
     """
 
-    profile_ = Profile.objects.get(user=request.user)
-    if profile_.name and profile_.lastname and profile_.address and \
-            profile_.birth_date and profile_.city and profile_.country:
-
-        hotels_ = Hotel.objects.all()
-        form = HotelSelectForm()
-
-        paginator = Paginator(Hotel.objects.all(), 2)
-        page_number = request.GET.get('page')
-        paged_hotels = paginator.get_page(page_number)
+    if request.profile_context.complete:
 
         context = {
-            "hotels": hotels_,
-            "form": form,
-            "hotels_": paged_hotels
+            "hotels": affordable(bookable_options(), request.profile_context.balance),
+            "hotels_": catalog_page(
+                after=request.GET.get('after'),
+                before=request.GET.get('before'),
+                page=request.GET.get('page'),
+            ),
+            "balance": request.profile_context.balance
         }
 
-        # Naujas vartotojas neturi balanso - taisom crash.
-        try:
-            balance = Balance.objects.get(user=request.user)
-            rounded = round(balance.balance, 2)
-            context['balance'] = rounded
-        except ObjectDoesNotExist:
-            balance = Balance.objects.create(user=request.user, balance=0)
-            balance.save()
-            context['balance'] = balance.balance
-        #########################################
-
         return render(request, 'hotels.html', context=context)
 
     else:
@@ -166,11 +249,9 @@ def make_reservation(request):
         except ObjectDoesNotExist:
             return redirect('hotels')
 
-        balance = Balance.objects.select_related().get(user=request.user)
-
         context = {
             'hotel': hotel,
-            'balance': round(balance.balance, 2),
+            'balance': request.profile_context.balance,
             'form': form
         }
 
@@ -197,38 +278,19 @@ def create_order(request, hotel_id):
             r_dates = form.cleaned_data.get('r_date')
             i_dates = form.cleaned_data.get('i_date')
 
-            # Praejusu dienu pataisymas
-            if r_dates < date.today() or i_dates < date.today():
+            try:
+                hotel = Hotel.objects.get(pk=hotel_id)
+            except ObjectDoesNotExist:
                 return redirect('hotels')
 
-            days = (i_dates - r_dates).days
-
-            balance = Balance.objects.select_related().get(user=request.user)
-            order = form.save(commit=False)
-            order.hotel = Hotel.objects.get(pk=hotel_id)
-            order.user_id = request.user.id
-            order.client = Profile.objects.get(user_id=request.user.id)
-
-            # neigiamos dienos nepriimamos.
-            if days == 0 or days < 0:
+            # Praėjusios ar neigiamos dienos, nepakankamas balancas ir
+            # užimtos naktys - BookingError, nieko neišsaugoma.
+            try:
+                order = book_hotel(request.user, hotel, r_dates, i_dates)
+            except BookingError:
                 return redirect('hotels')
 
-            if balance.balance >= (days * order.hotel.price):
-                balance.balance = balance.balance - (days * order.hotel.price)
-                balance.save()
-
-                order = form.save(commit=False)
-                order.hotel = Hotel.objects.get(pk=hotel_id)
-
-                hotel = Hotel.objects.get(id=hotel_id)
-
-                hotel.availability = hotel.availability - 1
-                hotel.save()
-                order.save()
-
-                return redirect('order_confirmation', order_id=order.id)
-            else:
-                return redirect('hotels')
+            return redirect('order_confirmation', order_id=order.id)
         else:
             return redirect('hotels')
     else:
@@ -236,6 +298,43 @@ def create_order(request, hotel_id):
 
 
 @login_required(login_url="/viesbuciai/accounts/login/")
+def group_reservation(request):
+    """
+    Grupinės rezervacijos view'sas (agentūroms).
+    :param request: automatinė užklausa, ?lines= - eilučių kiekis formoje.
+    :return: visos eilutės patikrinamos ir užsakomos viena transakcija
+    (balansas nurašomas vieną kartą). Bent vienai nepavykus - neužsakoma nieko.
+    """
+    if not request.profile_context.complete:
+        return HttpResponseRedirect('/viesbuciai/accounts/profile/')
+
+    try:
+        lines = int(request.GET.get('lines', 10))
+    except ValueError:
+        lines = 10
+    lines = max(1, min(lines, GROUP_RESERVATION_MAX_LINES))
+
+    formset_class = group_reservation_formset(lines)
+    formset = formset_class(request.POST or None, form_kwargs={'hotels': bookable_hotels()})
+
+    if request.method == 'POST' and formset.is_valid():
+        lines = [
+            (form.cleaned_data['hotel'], form.cleaned_data['r_date'], form.cleaned_data['i_date'])
+            for form in formset if form.cleaned_data
+        ]
+        try:
+            book_group(request.user, lines)
+        except BookingError:
+            messages.error(request, 'Rezervacija nepavyko: nepakanka balanco arba nėra laisvų vietų.')
+        else:
+            return redirect('orders')
+
+    context = {'formset': formset, 'balance': request.profile_context.balance}
+    return render(request, 'group_reservation.html', context)
+
+
+@login_required(login_url="/viesbuciai/accounts/login/")
+@replica_reads
 def order_confirmation(request, order_id):
     """
     Užsakymo patvirtinimo view'sas.
@@ -247,6 +346,7 @@ def order_confirmation(request, order_id):
     return render(request, 'order_confirmation.html', {'order': order})
 
 
+@replica_reads
 def my_orders(request):
     """
     Mano užsakymų view'sas.
@@ -255,25 +355,80 @@ def my_orders(request):
     nukreipimas į prisijungimo langą.
     """
     if request.user.is_authenticated:
-        orders_ = Order.objects.filter(client=request.user.profile)
+        orders_ = Order.objects.filter(client__user=request.user).select_related('hotel', 'admin_details')
         return render(request, 'my_orders.html', {'orders': orders_})
     else:
         return redirect('login')
 
 
+@replica_reads
 def orders(request):
     """
     Visų užsakymų view'sas
     :param request: automatinė užklausa.
-    :return: rodomi visi užsakymai (tik su admin userio prieiga)
+    :return: rodomi visi užsakymai (tik su admin userio prieiga), naujausi
+    pirmiau, puslapiais pagal kursorių. Klientas, viešbutis ir admin detalės
+    gaunami ta pačia užklausa.
     """
     if request.user.is_authenticated:
-        orders_ = Order.objects.all()
-        return render(request, 'orders.html', {'orders_': orders_})
+        form = OrderFilterForm(request.GET)
+        orders_ = Order.objects.select_related('client', 'hotel', 'admin_details')
+        if form.is_valid():
+            orders_ = orders_.filtered(**form.cleaned_data)
+
+        paged_orders = keyset_page(
+            orders_, ORDERS_PER_PAGE,
+            after=request.GET.get('after'), before=request.GET.get('before'), key='-id'
+        )
+
+        # Filtrai išlaikomi pereinant tarp puslapių.
+        filters = request.GET.copy()
+        filters.pop('after', None)
+        filters.pop('before', None)
+
+        context = {'orders_': paged_orders, 'form': form, 'filters': filters.urlencode()}
+        return render(request, 'orders.html', context)
     else:
         return redirect('login')
 
 
+@login_required(login_url="/viesbuciai/accounts/login/")
+@replica_reads
+def daily_report(request):
+    """
+    Viešbučių užimtumo ir pajamų ataskaita (užimtumas, pajamos, ADR, RevPAR).
+    :param request: automatinė užklausa.
+    :return: laikotarpio suvestinė kiekvienam viešbučiui (puslapiais pagal
+    kursorių), o pasirinkus viešbutį - ir kiekviena diena. Skaitoma tik
+    DailyHotelStats lentelė. Prieiga tik admin useriui.
+    """
+    if request.user.username != 'admin':
+        return redirect('index')
+
+    form = DailyReportForm(request.GET)
+    filters = form.cleaned_data if form.is_valid() else {}
+    date_to = filters.get('date_to') or date.today()
+    date_from = filters.get('date_from') or date_to - timedelta(days=REPORT_DAYS - 1)
+    hotel = filters.get('hotel')
+
+    hotels_ = keyset_page(
+        Hotel.objects.filter(pk=hotel.pk) if hotel else Hotel.objects.all(), ORDERS_PER_PAGE,
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+    days = daily_rows(hotel, date_from, date_to) if hotel else []
+
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query.update({'date_from': date_from, 'date_to': date_to})
+
+    context = {
+        'form': form, 'hotels_': hotels_, 'totals': hotel_totals(hotels_, date_from, date_to),
+        'days': days, 'date_from': date_from, 'date_to': date_to, 'filters': query.urlencode(),
+    }
+    return render(request, 'daily_report.html', context)
+
+
 @login_required(login_url="/viesbuciai/accounts/login/")
 def edit_order(request, pk):
     """
@@ -300,41 +455,25 @@ def edit_order(request, pk):
 
 
 @login_required(login_url="/viesbuciai/accounts/login/")
+@replica_reads
 def hotel_filter(request):
 
     """
     Viešbučių filtravimo paieška pagal viešbučio pavadimą,
     reitingą ir max žmonių kiekį.
+    Nurodžius ?q= - pilno teksto paieška (žr. search.py).
     """
 
-    profile_ = Profile.objects.get(user=request.user)
-    if profile_.name and profile_.lastname and profile_.address and \
-            profile_.birth_date and profile_.city and profile_.country:
-
-        hotels_ = Hotel.objects.all()
-        name = request.GET.get('name')
-
-        if name:
-            hotels_ = hotels_.filter(name__iexact=name)
-        stars = request.GET.get('stars')
-        if stars:
-            hotels_ = hotels_.filter(stars=stars)
-        quantity = request.GET.get('quantity')
-        if quantity:
-            hotels_ = hotels_.filter(quantity=quantity)
-
-        context = {'hotels': hotels_}
+    if request.profile_context.complete:
 
-        # naujas vartotojas neturi balanso -  taisom.
+        hotels_ = filter_hotels(
+            name=request.GET.get('name'),
+            q=request.GET.get('q'),
+            stars=request.GET.get('stars'),
+            quantity=request.GET.get('quantity'),
+        )
 
-        try:
-            balance = Balance.objects.get(user=request.user)
-            rounded = round(balance.balance, 2)
-            context['balance'] = rounded
-        except ObjectDoesNotExist:
-            context['balance'] = 0
-
-        #####################################
+        context = {'hotels': hotels_, 'balance': request.profile_context.balance}
 
         return render(request, 'hotel_filter.html', context)
 
@@ -349,32 +488,19 @@ def add_user_balance_view(request, user_id):
     Balanco pridėjimo view'sas.
     :param request: automatinė užklausa
     :param user_id: vartotojo id
-    :return: Jeigu balancas nėra neigiamas arba neteisingu formatu,
-    pridedamas balancas.
+    :return: Jeigu suma nėra neigiama arba neteisingu formatu,
+    balanso žurnale įrašomas papildymas.
     """
 
-    # Naujas vartotojas neturi balanso - taisom crash.
-    try:
-        balance = Balance.objects.select_related().get(user=user_id)
-    except ObjectDoesNotExist:
-        user = User.objects.get(id=user_id)
-        balance = Balance.objects.create(user=user, balance=0)
-        balance.save()
-    #########################################
-
     if request.method == 'POST':
 
         try:
-            amount = float(request.POST.get('amount'))
-        except ValueError:
-            pass
+            amount = to_cents(request.POST.get('amount'))
+        except (TypeError, ArithmeticError):
+            return redirect('all_users')
 
-        try:
-            if not amount < 0:
-                balance.balance = amount
-                balance.save()
-        except UnboundLocalError:
-            pass
+        if amount > 0 and User.objects.filter(id=user_id).exists():
+            BalanceLedger.objects.record(user_id, amount, BalanceLedger.TOPUP)
 
         return redirect('all_users')
 
@@ -382,24 +508,52 @@ def add_user_balance_view(request, user_id):
 
 
 @login_required(login_url="/viesbuciai/accounts/login/")
+@replica_reads
 def all_users_view(request):
     """
     Visu vartotoju peržiūros view'sas.
     Prieiga tik admin useriui.
+    Vartotojai, jų profiliai ir balansai gaunami viena užklausa, puslapiais
+    pagal kursorių. ?q= - paieška pagal slapyvardžio, vardo, pavardės ar miesto pradžią.
     """
-    users = User.objects.all()
-    context = {'users': []}
-    for user in users:
-        try:
-            balance = Balance.objects.get(user=user)
-            profile_ = Profile.objects.get(user=user)
-            context['users'].append({'user': user, 'balance': round(balance.balance, 2), 'profile': profile_})
-        except ObjectDoesNotExist:
-            profile_ = Profile.objects.get(user=user)
-            context['users'].append({'user': user, 'balance': None, 'profile': profile_})
+    balance = Balance.objects.filter(user=OuterRef('pk')).values('cents')[:1]
+    users = User.objects.select_related('profile').annotate(cents=Subquery(balance))
+
+    query = request.GET.get('q', '').strip()
+    if query:
+        users = users.filter(user_search_q(query))
+
+    paged_users = keyset_page(
+        users, USERS_PER_PAGE, after=request.GET.get('after'), before=request.GET.get('before')
+    )
+
+    context = {'users': [], 'page': paged_users, 'q': query}
+    for user in paged_users:
+        context['users'].append({
+            'user': user,
+            'balance': None if user.cents is None else Decimal(user.cents) / 100,
+            'profile': getattr(user, 'profile', None)
+        })
     return render(request, 'all_users.html', context)
 
 
+def user_search_q(query):
+    """
+    Paieška pagal lauko pradžią intervalu (>= q ir < q + U+FFFF), kad būtų
+    naudojami indeksai. Tikrinama ir su didžiąja pirmąja raide (vardai, miestai).
+    """
+    terms = {query, query[:1].upper() + query[1:]}
+
+    def prefix(field):
+        condition = Q()
+        for term in terms:
+            condition |= Q(**{f'{field}__gte': term, f'{field}__lt': term + '\uffff'})
+        return condition
+
+    profiles = Profile.objects.filter(prefix('name') | prefix('lastname') | prefix('city')).values('user_id')
+    return prefix('username') | Q(pk__in=profiles)
+
+
 @login_required(login_url="/viesbuciai/accounts/login/")
 def add_hotel_view(request):
     """
@@ -436,3 +590,32 @@ def delete_hotel(request, pk):
             return redirect('hotel_filter')
     else:
         return render(request, 'hotel_confirm_delete.html', {'pk': pk})
+
+
+@login_required(login_url="/viesbuciai/accounts/login/")
+@replica_reads
+def export_view(request, kind):
+    """
+    Užsakymų arba viešbučių eksportas (?format=csv|ndjson).
+    Užsakymams galimi tie patys filtrai, kaip ir užsakymų sąraše.
+    Atsakymas siunčiamas srautu, todėl atmintis nepriklauso nuo eilučių kiekio.
+    Prieiga tik admin useriui.
+    """
+    if request.user.username != 'admin':
+        return redirect('index')
+
+    export_format = request.GET.get('format', 'csv')
+    if kind not in EXPORTS or export_format not in FORMATS:
+        return redirect('orders_')
+
+    filters = {}
+    if kind in EXPORT_FILTER_FORMS:
+        form = EXPORT_FILTER_FORMS[kind](request.GET)
+        if form.is_valid():
+            filters = form.cleaned_data
+
+    stream, content_type = FORMATS[export_format]
+    # Eilutės skaitomos jau po middleware - maršrutizavimo būsena pririšama prie srauto.
+    response = StreamingHttpResponse(bound(stream(kind, export_rows(kind, **filters))), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{export_format}"'
+    return response